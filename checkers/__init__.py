@@ -16,12 +16,12 @@ KING = 4 # Not 3 because the binary for 2 and 3 overlap (0b110 vs 0b010)
 
 # I could also find a different solution for the board but I'll adhere to what py-chess does
 
-SQUARES = {}
+from checkers.squares import SQUARE_NAMES
 
-def index_to_square(index):
-	inverted = { v: k for k, v in SQUARES.items() }
+SQUARES = { name: index for index, name in enumerate(SQUARE_NAMES) }
 
-	return inverted[index]
+def index_to_square(index):
+	return SQUARE_NAMES[index]
 
 # Convert A1 etc to an index
 def parse_square(square):
@@ -33,22 +33,6 @@ def parse_square(square):
 
 	return SQUARES[square]
 
-_rows = "ABCDEFGH"
-
-_col = 1
-
-_c = 0
-
-for i in reversed(range(64)):
-	SQUARES[f"{_rows[i % 8]}{_col}"] = i
-
-	_c += 1
-
-	if _c == 8:
-		_c = 0
-		_col += 1
-
-
 STARTING_BOARD_FEN = 'PPPPPPPP/PPPPPPPP/8/8/8/8/PPPPPPPP/PPPPPPPP'
 
 class OldPiece:
@@ -64,4 +48,15 @@ class IllegalMoveError(Exception):
 	pass
 	
 class AmbiguousMoveError(Exception):
-	pass
\ No newline at end of file
+	pass
+
+class HashMismatchError(Exception):
+	pass
+
+# A ValueError too, which is what pdn.parse_fen used to raise
+class InvalidFenError(ValueError):
+	pass
+
+# Imported last since it builds its lookup tables from the constants above
+from checkers.bitboard import BitBoard
+from checkers.position import Position
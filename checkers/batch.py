@@ -0,0 +1,162 @@
+import checkers
+
+from checkers import codec
+from checkers.engine import Engine
+from checkers.perft import perft
+from checkers.transposition import TranspositionTable
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import os
+
+# Analysis of many positions spread over worker processes. Positions travel as fen strings or 13 byte codec keys,
+# never as Board objects, and go in chunks so the cost of talking to a worker is shared by many positions.
+
+# Best move, score and principal variation from Engine.search
+SEARCH = "search"
+
+# Leaf nodes to depth, so depth 1 is the number of legal moves
+COUNT = "count"
+
+DEFAULT_CHUNKSIZE = 64
+
+# Chunks handed out per worker before waiting on results, which keeps memory flat however many positions come in
+WINDOW = 4
+
+# Per process transposition table size. A worker reuses one engine but clears its table before every position, so a
+# position gets the same answer whichever worker analyses it and whatever came before it.
+TABLE_SIZE_MB = 8
+
+_engine = None
+
+# Boards travel as checkers.codec keys, fens as they are
+def encode(position):
+	if isinstance(position, str):
+		return position
+
+	return codec.encode(position)
+
+def decode(encoded):
+	if isinstance(encoded, str):
+		return checkers.BitBoard(encoded)
+
+	return codec.decode(encoded, checkers.BitBoard)
+
+def _analyse_position(board, mode, depth, time_limit):
+	global _engine
+
+	if mode == COUNT:
+		return { "nodes": perft(board, depth) }
+
+	if _engine is None:
+		_engine = Engine(table = TranspositionTable(TABLE_SIZE_MB))
+
+	_engine.new_game()
+
+	result = _engine.search(board, depth, time_limit)
+
+	if result is None:
+		return { "move": None, "score": None, "pv": [], "depth": 0, "nodes": 0 }
+
+	return {
+		"move": result.move.uci(),
+		"score": result.score,
+		"pv": [move.uci() for move in result.pv],
+		"depth": result.depth,
+		"nodes": result.nodes
+	}
+
+# Runs in the worker, returns one result dict per position of the chunk
+def _analyse_chunk(chunk, mode, depth, time_limit):
+	results = []
+
+	for index, encoded in chunk:
+		result = _analyse_position(decode(encoded), mode, depth, time_limit)
+
+		result["index"] = index
+
+		results.append(result)
+
+	return results
+
+def _chunks(positions, chunksize):
+	chunk = []
+
+	for index, position in enumerate(positions):
+		chunk.append((index, encode(position)))
+
+		if len(chunk) == chunksize:
+			yield chunk
+
+			chunk = []
+
+	if chunk:
+		yield chunk
+
+# Analyses every position (fen strings or boards) and yields a result dict for each, with "index" giving its place in the input.
+# Results come back in input order, or as soon as they are ready with ordered = False. workers = 1 runs everything in this process.
+def analyse(positions, depth = 4, workers = None, mode = SEARCH, ordered = True, chunksize = DEFAULT_CHUNKSIZE, time_limit = None):
+	if mode not in (SEARCH, COUNT):
+		raise ValueError("Unknown analysis mode: " + str(mode))
+
+	workers = workers or os.cpu_count() or 1
+
+	chunks = _chunks(positions, chunksize)
+
+	if workers == 1:
+		for chunk in chunks:
+			yield from _analyse_chunk(chunk, mode, depth, time_limit)
+
+		return
+
+	with ProcessPoolExecutor(workers) as executor:
+		def submit():
+			chunk = next(chunks, None)
+
+			if chunk is None:
+				return None
+
+			return executor.submit(_analyse_chunk, chunk, mode, depth, time_limit)
+
+		if ordered:
+			pending = deque()
+
+			for _ in range(workers * WINDOW):
+				future = submit()
+
+				if future is None:
+					break
+
+				pending.append(future)
+
+			while pending:
+				results = pending.popleft().result()
+
+				future = submit()
+
+				if future is not None:
+					pending.append(future)
+
+				yield from results
+		else:
+			pending = set()
+
+			for _ in range(workers * WINDOW):
+				future = submit()
+
+				if future is None:
+					break
+
+				pending.add(future)
+
+			while pending:
+				done, pending = wait(pending, return_when = FIRST_COMPLETED)
+
+				for _ in done:
+					future = submit()
+
+					if future is not None:
+						pending.add(future)
+
+				for future in done:
+					yield from future.result()
@@ -0,0 +1,269 @@
+import checkers
+
+from checkers import codec
+
+from checkers.board import Board, Move, MultiJump, pack_move
+
+from checkers.squares import bits, BIT_SQUARES, SQUARE_BITS, SQUARE_MASKS, UP_LEFT, UP_RIGHT, DOWN_LEFT, DOWN_RIGHT
+
+ALL_SQUARES = 0xFFFFFFFF
+
+# Rows 0, 2, 4 and 6 start with a light square, the others with a dark one, which is why one row up or down is a shift of 3, 4 or 5
+EVEN_ROWS = 0x0F0F0F0F
+
+ODD_ROWS = 0xF0F0F0F0
+
+TOP_ROW = 0x0000000F
+
+BOTTOM_ROW = 0xF0000000
+
+LEFT_EDGE = 0x10101010
+
+RIGHT_EDGE = 0x08080808
+
+DIRECTIONS = (UP_LEFT, UP_RIGHT, DOWN_LEFT, DOWN_RIGHT)
+
+OPPOSITE = (DOWN_RIGHT, DOWN_LEFT, UP_RIGHT, UP_LEFT)
+
+# Red men move up the board, black men move down
+FORWARD = {
+	checkers.RED: (UP_LEFT, UP_RIGHT),
+	checkers.BLACK: (DOWN_LEFT, DOWN_RIGHT)
+}
+
+_UP_LEFT_EVEN = EVEN_ROWS & ~TOP_ROW
+
+_UP_LEFT_ODD = ODD_ROWS & ~LEFT_EDGE
+
+_UP_RIGHT_EVEN = EVEN_ROWS & ~TOP_ROW & ~RIGHT_EDGE
+
+_DOWN_LEFT_ODD = ODD_ROWS & ~LEFT_EDGE & ~BOTTOM_ROW
+
+_DOWN_RIGHT_EVEN = EVEN_ROWS & ~RIGHT_EDGE
+
+_DOWN_RIGHT_ODD = ODD_ROWS & ~BOTTOM_ROW
+
+# Moves every set bit one diagonal step, bits that would leave the board are dropped
+def step(bits, direction):
+	if direction == UP_LEFT:
+		return ((bits & _UP_LEFT_EVEN) >> 4) | ((bits & _UP_LEFT_ODD) >> 5)
+
+	if direction == UP_RIGHT:
+		return ((bits & _UP_RIGHT_EVEN) >> 3) | ((bits & ODD_ROWS) >> 4)
+
+	if direction == DOWN_LEFT:
+		return ((bits & EVEN_ROWS) << 4) | ((bits & _DOWN_LEFT_ODD) << 3)
+
+	return ((bits & _DOWN_RIGHT_EVEN) << 5) | ((bits & _DOWN_RIGHT_ODD) << 4)
+
+# NEIGHBORS[direction][bit] is the bit one step away, JUMPS[direction][bit] two steps away, -1 if that is off the board
+NEIGHBORS = tuple(tuple(step(1 << bit, direction).bit_length() - 1 for bit in range(32)) for direction in DIRECTIONS)
+
+JUMPS = tuple(tuple(step(step(1 << bit, direction), direction).bit_length() - 1 for bit in range(32)) for direction in DIRECTIONS)
+
+def directions_for(color, king):
+	return DIRECTIONS if king else FORWARD[color]
+
+# Pieces of `own` that have a simple move available
+def movers(own, kings, empty, color):
+	result = 0
+
+	for direction in DIRECTIONS:
+		pieces = own if direction in FORWARD[color] else own & kings
+
+		result |= pieces & step(empty, OPPOSITE[direction])
+
+	return result
+
+# Pieces of `own` that can jump a piece of `opponent`
+def jumpers(own, opponent, kings, empty, color):
+	result = 0
+
+	for direction in DIRECTIONS:
+		pieces = own if direction in FORWARD[color] else own & kings
+
+		result |= pieces & step(opponent & step(empty, OPPOSITE[direction]), OPPOSITE[direction])
+
+	return result
+
+# (from, to) bit pairs of every simple move, found a whole direction at a time
+def simple_moves(own, kings, empty, color):
+	for direction in DIRECTIONS:
+		pieces = own if direction in FORWARD[color] else own & kings
+
+		neighbors = NEIGHBORS[direction]
+
+		for bit in bits(pieces & step(empty, OPPOSITE[direction])):
+			yield bit, neighbors[bit]
+
+# Every complete capture sequence of the piece on `start`, as a tuple of (from, to, captured) bits per jump.
+# `empty` must include the start square. Captured pieces stay on the board until the move is over, so they can't be jumped twice or landed on.
+def capture_paths(start, directions, opponent, empty):
+	stack = [(start, 0, ())]
+
+	while stack:
+		square, captured, path = stack.pop()
+
+		extended = False
+
+		for direction in directions:
+			target = JUMPS[direction][square]
+
+			if target < 0 or not empty & (1 << target):
+				continue
+
+			over = 1 << NEIGHBORS[direction][square]
+
+			if opponent & over and not captured & over:
+				stack.append((target, captured | over, path + ((square, target, NEIGHBORS[direction][square]),)))
+
+				extended = True
+
+		if not extended and path:
+			yield path
+
+class BitBoard(Board):
+	# Drop in replacement for Board that keeps red, black and king masks of the dark squares next to Board.squares.
+	# Write squares through play_move/push/pop (or load_fen) so the masks stay in sync, or call resync() afterwards.
+
+	def load_fen(self, fen):
+		super().load_fen(fen)
+
+		self.red_mask = 0
+
+		self.black_mask = 0
+
+		self.king_mask = 0
+
+		for square in range(64):
+			self._set_square(square, self.squares[square])
+
+	def load_snapshot(self, position):
+		super().load_snapshot(position)
+
+		self.red_mask, self.black_mask, self.king_mask = codec.square_masks(self.squares)
+
+	def resync(self):
+		super().resync()
+
+		self.red_mask, self.black_mask, self.king_mask = codec.square_masks(self.squares)
+
+	def _set_square(self, square, value):
+		super()._set_square(square, value)
+
+		mask = SQUARE_MASKS[square]
+
+		if not mask:
+			return
+
+		self.red_mask &= ~mask
+
+		self.black_mask &= ~mask
+
+		self.king_mask &= ~mask
+
+		if value == checkers.EMPTY:
+			return
+
+		if value & 1 == checkers.RED:
+			self.red_mask |= mask
+		else:
+			self.black_mask |= mask
+
+		if value & checkers.KING:
+			self.king_mask |= mask
+
+	def empty_mask(self):
+		return ALL_SQUARES & ~(self.red_mask | self.black_mask)
+
+	def player_mask(self, player):
+		return self.red_mask if player == checkers.RED else self.black_mask
+
+	def get_player_pieces(self, player):
+		return [BIT_SQUARES[bit] for bit in bits(self.player_mask(player))]
+
+	def has_jump(self, player):
+		return jumpers(self.player_mask(player), self.player_mask(not player), self.king_mask, self.empty_mask(), player) != 0
+
+	def has_simple_move(self, player):
+		return movers(self.player_mask(player), self.king_mask, self.empty_mask(), player) != 0
+
+	def _find_captures(self, square, up, down):
+		start = SQUARE_BITS[square]
+
+		if start < 0 or self.squares[square] == checkers.EMPTY:
+			return []
+
+		directions = (FORWARD[checkers.RED] if up else ()) + (FORWARD[checkers.BLACK] if down else ())
+
+		opponent = self.player_mask(not (self.squares[square] & 1))
+
+		found = []
+
+		for path in capture_paths(start, directions, opponent, self.empty_mask() | (1 << start)):
+			found.append((tuple((BIT_SQUARES[frm], BIT_SQUARES[to], BIT_SQUARES[over]) for frm, to, over in path), len(path)))
+
+		return found
+
+	def generate_legal_moves(self):
+		own = self.player_mask(self.turn)
+
+		opponent = self.player_mask(not self.turn)
+
+		empty = self.empty_mask()
+
+		paths = []
+
+		for start in bits(jumpers(own, opponent, self.king_mask, empty, self.turn)):
+			directions = directions_for(self.turn, self.king_mask & (1 << start))
+
+			for path in capture_paths(start, directions, opponent, empty | (1 << start)):
+				if self.require_all_jumps:
+					paths.append(path)
+				else:
+					# Stopping early is allowed, so every prefix is a move of its own
+					paths += [path[:i + 1] for i in range(len(path)) if path[:i + 1] not in paths]
+
+		captures = [MultiJump([Move(BIT_SQUARES[frm], BIT_SQUARES[to], [BIT_SQUARES[over]]) for frm, to, over in path]) for path in paths]
+
+		yield from captures
+
+		if self.require_jumps and captures:
+			return
+
+		for frm, to in simple_moves(own, self.king_mask, empty, self.turn):
+			yield Move(BIT_SQUARES[frm], BIT_SQUARES[to])
+
+	def generate_packed_moves(self):
+		own = self.player_mask(self.turn)
+
+		opponent = self.player_mask(not self.turn)
+
+		empty = self.empty_mask()
+
+		packed = []
+
+		for start in bits(jumpers(own, opponent, self.king_mask, empty, self.turn)):
+			directions = directions_for(self.turn, self.king_mask & (1 << start))
+
+			for path in capture_paths(start, directions, opponent, empty | (1 << start)):
+				prefixes = [path] if self.require_all_jumps else [path[:i + 1] for i in range(len(path))]
+
+				for prefix in prefixes:
+					captures = 0
+
+					for frm, to, over in prefix:
+						captures |= 1 << over
+
+					move = pack_move(BIT_SQUARES[start], BIT_SQUARES[prefix[-1][1]], captures, prefix[-1][1] < 4 or prefix[-1][1] >= 28)
+
+					if move not in packed:
+						packed.append(move)
+
+		yield from packed
+
+		if self.require_jumps and packed:
+			return
+
+		for frm, to in simple_moves(own, self.king_mask, empty, self.turn):
+			yield pack_move(BIT_SQUARES[frm], BIT_SQUARES[to], 0, to < 4 or to >= 28)
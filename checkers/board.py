@@ -1,5 +1,28 @@
 import checkers
 
+from checkers import zobrist
+from checkers.position import Position
+
+from checkers.squares import bits, BIT_SQUARES, SQUARE_MASKS, SQUARE_NAMES, NEIGHBOR_SQUARES, JUMP_SQUARES, UP_LEFT, UP_RIGHT, DOWN_LEFT, DOWN_RIGHT
+
+ALL_DIRECTIONS = (UP_LEFT, UP_RIGHT, DOWN_LEFT, DOWN_RIGHT)
+
+# Moves can also be packed into a single int, which is what search and generation use internally:
+#
+#   bits 0-5     from square
+#   bits 6-11    to square
+#   bits 12-43   captured squares, as a mask of dark square bits (see checkers.squares)
+#   bit 44       promotion, the move lands on a back row and crowns a man
+#
+# Move.pack() and Move.from_packed() convert between the two forms.
+
+PACKED_CAPTURES_SHIFT = 12
+
+PACKED_PROMOTION = 1 << 44
+
+def pack_move(from_square, to_square, captures = 0, promotion = False):
+	return from_square | to_square << 6 | captures << PACKED_CAPTURES_SHIFT | (PACKED_PROMOTION if promotion else 0)
+
 class Piece:
 	def __init__(self, king, color):
 		self.is_king = king
@@ -12,9 +35,11 @@ class Piece:
 		if self.color == checkers.RED:
 			repr = repr.lower()
 
-		return repr + f" {checkers.index_to_square(self.square)}"
+		return repr + f" {SQUARE_NAMES[self.square]}"
 
 class Move:
+	__slots__ = ("from_square", "to_square", "drops", "dropped", "last", "promotion", "promoted")
+
 	def __init__(self, from_square, to_square, drops = None, last = None):
 		self.from_square = from_square
 		
@@ -28,8 +53,11 @@ class Move:
 
 		self.promotion = (to_square >= 0 and to_square < 8) or (to_square >= 56 and to_square < 64)
 
+		# Set by Board.do_move once it knows whether the piece was a man
+		self.promoted = False
+
 	def uci(self):
-		return checkers.index_to_square(self.from_square) + checkers.index_to_square(self.to_square)
+		return SQUARE_NAMES[self.from_square] + SQUARE_NAMES[self.to_square]
 
 	def contains(self, square):
 		return self.from_square == square or self.to_square == square
@@ -72,14 +100,56 @@ class Move:
 		except KeyError:
 			raise checkers.InvalidMoveError("Invalid move: " + uci_string)
 
+	def pack(self):
+		captures = 0
+
+		for square in self.drops:
+			captures |= SQUARE_MASKS[square]
+
+		return pack_move(self.from_square, self.to_square, captures, self.promotion)
+
+	def from_packed(packed):
+		from_square = packed & 0x3F
+
+		to_square = (packed >> 6) & 0x3F
+
+		captures = (packed >> PACKED_CAPTURES_SHIFT) & 0xFFFFFFFF
+
+		if not captures:
+			return Move(from_square, to_square)
+
+		# Only the captured squares are stored, so walk the jumps back from them. Each jump lands right behind the piece it takes.
+		stack = [(from_square, captures, [])]
+
+		while stack:
+			square, remaining, path = stack.pop()
+
+			if not remaining:
+				if square == to_square:
+					return MultiJump(path)
+
+				continue
+
+			for direction in ALL_DIRECTIONS:
+				over = NEIGHBOR_SQUARES[direction][square]
+
+				target = JUMP_SQUARES[direction][square]
+
+				if target >= 0 and remaining & SQUARE_MASKS[over]:
+					stack.append((target, remaining & ~SQUARE_MASKS[over], path + [Move(square, target, [over])]))
+
+		raise checkers.InvalidMoveError(f"Invalid packed move: {packed:#x}")
+
 	def __str__(self):
-		return f"<{checkers.index_to_square(self.from_square)} {checkers.index_to_square(self.to_square)} {[checkers.index_to_square(square) for square in self.drops]}>"
+		return f"<{SQUARE_NAMES[self.from_square]} {SQUARE_NAMES[self.to_square]} {[SQUARE_NAMES[square] for square in self.drops]}>"
 
 	def __repr__(self):
 		return str(self)
 
 
 class MultiJump(Move):
+	__slots__ = ("moves",)
+
 	def __init__(self, moves):
 		self.moves = moves
 
@@ -88,17 +158,12 @@ class MultiJump(Move):
 		else:
 			super().__init__(0, 0)
 
+	# The start square, then every square a jump lands on once, which Move.from_uci reads back
 	def uci(self):
-		uci = ""
-
-		c = 0
-				
-		for move in self.moves:
-			uci += move.uci() if c % 2 == 0 else checkers.index_to_square(move.to_square)
-
-			c += 1
+		if len(self.moves) == 0:
+			return ""
 
-		return uci
+		return SQUARE_NAMES[self.moves[0].from_square] + "".join(SQUARE_NAMES[move.to_square] for move in self.moves)
 
 	def contains(self, square):
 		for move in self.moves:
@@ -107,6 +172,15 @@ class MultiJump(Move):
 
 		return False
 
+	def pack(self):
+		captures = 0
+
+		for move in self.moves:
+			for square in move.drops:
+				captures |= SQUARE_MASKS[square]
+
+		return pack_move(self.from_square, self.to_square, captures, self.promotion)
+
 	def __str__(self):
 		string = "["
 
@@ -115,24 +189,123 @@ class MultiJump(Move):
 
 		return string + "]"
 
+# Squares a move passes through, the start and every landing square. Enough to tell any two moves apart.
+def _move_path(move):
+	if type(move) is MultiJump:
+		return (move.from_square,) + tuple(m.to_square for m in move.moves)
+
+	return (move.from_square, move.to_square)
+
+# FEN character of every square value (colour | PIECE or KING), board.py loads before checkers has the constants
+_FEN_CHARACTERS = "--PpKk"
+
+# The layout part of a FEN for a Board.squares list, what Board.fen() writes before the side to move
+def fen_layout(squares):
+	rows = []
+
+	for row in range(8):
+		text = "".join(_FEN_CHARACTERS[piece] for piece in squares[row * 8:row * 8 + 8])
+
+		rows.append("8" if text == "--------" else text)
+
+	return "/".join(rows)
+
 class Board:
 	def __init__(self, fen = "-P-P-P-P/P-P-P-P-/-P-P-P-P/--------/--------/p-p-p-p-/-p-p-p-p/p-p-p-p-"):
 		self.squares = [0] * 64
 
 		self.load_fen(fen)
 
-		self.turn = checkers.RED
+		self._reset_game()
 
+	# Everything a board keeps besides the position itself
+	def _reset_game(self):
 		self.move_number = 1
 
+		# Packed moves on the move stack can't hold what they captured, so push_packed keeps it here instead
+		self._packed_undo = []
+
 		self.move_stack = []
 
 		self.require_jumps = True
 
 		self.require_all_jumps = True
 
+		# Draw after this many plies in a row without a capture or a man moving, 40 moves each like the ACF rule. None turns it off.
+		self.move_limit = 80
+
+		# Draw once the same position with the same side to move has come up this many times. None turns it off.
+		self.repetition_limit = 3
+
+		self._reset_history()
+
+		# Recompute the hash from scratch after every push/pop and raise if the incremental one has drifted
+		self.verify_hash = False
+
+		# One view for the board's whole life, it notices on its own when the position has changed
 		self.legal_moves = LegalMoveGenerator(self)
 
+	# Repetition and move limit bookkeeping starts over from the current position. _hash_history has the key of every position
+	# since, _repetitions how often each of them came up and _clock_history halfmove_clock before every move, so push and pop
+	# only ever append or pop one entry of each.
+	def _reset_history(self):
+		# Plies since the last capture or man move
+		self.halfmove_clock = 0
+
+		self._clock_history = []
+
+		self._hash_history = [self._hash]
+
+		self._repetitions = { self._hash: 1 }
+
+	# After a move has been played, irreversible if it captured or moved a man
+	def _record(self, irreversible):
+		self._clock_history.append(self.halfmove_clock)
+
+		self.halfmove_clock = 0 if irreversible else self.halfmove_clock + 1
+
+		self._hash_history.append(self._hash)
+
+		self._repetitions[self._hash] = self._repetitions.get(self._hash, 0) + 1
+
+	# Before a move is taken back. Moves from before the history was last reset or loaded have nothing recorded.
+	def _unrecord(self):
+		if not self._clock_history:
+			return
+
+		key = self._hash_history.pop()
+
+		count = self._repetitions[key] - 1
+
+		if count:
+			self._repetitions[key] = count
+		else:
+			del self._repetitions[key]
+
+		self.halfmove_clock = self._clock_history.pop()
+
+	# Keys of the positions since the last capture or man move, the current one last. No earlier position can come up
+	# again, so this and halfmove_clock are all another board at this position needs to carry on the repetition count.
+	def repetition_history(self):
+		return self._hash_history[-(self.halfmove_clock + 1):]
+
+	# Takes over repetition_history() and halfmove_clock from a board at the same position, e.g. in another process.
+	# Moves played from here are recorded as usual, the loaded positions can't be popped.
+	def load_repetition_history(self, history, halfmove_clock):
+		if not history or history[-1] != self._hash:
+			raise ValueError("The history has to end with the current position")
+
+		self.halfmove_clock = halfmove_clock
+
+		self._clock_history = []
+
+		self._hash_history = list(history)
+
+		self._repetitions = {}
+
+		for key in history:
+			self._repetitions[key] = self._repetitions.get(key, 0) + 1
+
 	# Returns squares that contain pieces
 	def get_pieces(self):
 		return [square for square in self.squares if square != checkers.EMPTY]
@@ -146,26 +319,40 @@ class Board:
 
 		return squares
 
-	# Implementation of pseudo-FEN for checkers, only suitable for setting starting state
-	
+	# Pseudo-FEN for checkers. Eight rows from the top joined by "/", "-" for an empty square, p/k for red men and kings,
+	# P/K for black ones and "8" for an empty row, then optionally a space and "r" or "b" for the side to move (red if left out).
+
 	def load_fen(self, fen):
 		self.red_pieces = 0
 
 		self.black_pieces = 0
-		
-		spl = fen.replace("\n", "").split("/")
+
+		# The layout may be spread over several lines, only a trailing r or b is the side to move
+		fields = fen.split()
+
+		self.turn = checkers.BLACK if fields and fields[-1] == "b" else checkers.RED
+
+		if fields and fields[-1] in ("r", "b"):
+			fields.pop()
+
+		self.squares = [checkers.EMPTY] * 64
+
+		spl = "".join(fields).split("/")
+
+		if len(spl) != 8:
+			raise checkers.InvalidFenError("Invalid FEN: " + fen)
 
 		i = 0
 		
 		for row in spl:
 			if len(row) < 1 or (len(row) < 8 and len(row) > 1) or len(row) > 8:
-				raise Exception("Invalid FEN")
+				raise checkers.InvalidFenError("Invalid FEN: " + fen)
 
 			if len(row) < 8:
 				try:
 					i += int(row[0]) - 1
-				except:
-					raise Exception("Invalid FEN")
+				except ValueError:
+					raise checkers.InvalidFenError("Invalid FEN: " + fen)
 			
 			for column in row:
 				if column == "p" or column == "k":
@@ -180,7 +367,129 @@ class Board:
 
 				i += 1
 
-	
+		self._clear_caches()
+
+		self._hash = zobrist.hash_squares(self.squares) ^ (zobrist.TURN_KEY if self.turn == checkers.BLACK else 0)
+
+		self._reset_history()
+
+	def _clear_caches(self):
+		# Legal moves of the position and rules _legal_key stands for, see _legal_by_path
+		self._legal = {}
+
+		self._legal_key = None
+
+		# Capture sequences found so far, only valid while the hash is still _captures_hash
+		self._captures = {}
+
+		self._captures_hash = None
+
+	# Brings everything derived from the squares back in line with them after they were written directly instead of
+	# through push/pop or load_fen: the piece counts, the Zobrist key, the caches and the repetition history, which
+	# starts again from here. Subclasses that keep more state extend it.
+	def resync(self):
+		self.red_pieces = sum(1 for piece in self.squares if piece != checkers.EMPTY and piece & 1 == checkers.RED)
+
+		self.black_pieces = sum(1 for piece in self.squares if piece != checkers.EMPTY and piece & 1 == checkers.BLACK)
+
+		self._hash = zobrist.compute(self)
+
+		self._clear_caches()
+
+		self._reset_history()
+
+	# Immutable copy of the position (see checkers.position), cheap enough to take at every node
+	def snapshot(self):
+		return Position.from_board(self)
+
+	# Sets the position from a snapshot, the move stack is left alone but repetitions and the move limit count from here
+	def load_snapshot(self, position):
+		data = position.data
+
+		self.squares = list(data[:64])
+
+		self.turn = data[64] == 1
+
+		self.red_pieces = data[65]
+
+		self.black_pieces = data[66]
+
+		self._clear_caches()
+
+		self._hash = position.zobrist_hash
+
+		self._reset_history()
+
+	# A new board of this class at the snapshot's position with an empty move stack
+	@classmethod
+	def from_snapshot(cls, position):
+		board = cls.__new__(cls)
+
+		board.load_snapshot(position)
+
+		board._reset_game()
+
+		return board
+
+	# Same position and rules, without the move history
+	def copy(self):
+		board = self.from_snapshot(self.snapshot())
+
+		board.require_jumps = self.require_jumps
+
+		board.require_all_jumps = self.require_all_jumps
+
+		board.move_limit = self.move_limit
+
+		board.repetition_limit = self.repetition_limit
+
+		board.verify_hash = self.verify_hash
+
+		return board
+
+	# The position as a FEN load_fen reads back, side to move included
+	def fen(self):
+		return fen_layout(self.squares) + (" r" if self.turn == checkers.RED else " b")
+
+	# A copy of the position before the first move on the stack, like py-chess's Board.root(). The moves are taken back
+	# to get there and played again, so the board ends up as it was.
+	def root(self):
+		stack = list(self.move_stack)
+
+		for _ in stack:
+			self.pop()
+
+		board = self.copy()
+
+		for move in stack:
+			self.push(move)
+
+		return board
+
+	# Every square write made while playing moves goes through here so subclasses can keep extra state in sync
+	def _set_square(self, square, value):
+		self._hash ^= zobrist.PIECE_KEYS[self.squares[square]][square] ^ zobrist.PIECE_KEYS[value][square]
+
+		self.squares[square] = value
+
+	def _switch_turn(self):
+		self.turn = not self.turn
+
+		self._hash ^= zobrist.TURN_KEY
+
+	# 64-bit Zobrist key of the position and side to move, kept up to date by every move
+	def zobrist_hash(self):
+		if self.verify_hash:
+			self._verify_hash()
+
+		return self._hash
+
+	def _verify_hash(self):
+		expected = zobrist.compute(self)
+
+		if self._hash != expected:
+			raise checkers.HashMismatchError(f"Incremental hash {self._hash:016x} does not match recomputed hash {expected:016x}")
+
 	def do_move(self, move):
 		if len(move.drops) > 0:
 			move.dropped = []
@@ -193,39 +502,49 @@ class Board:
 				else:
 					self.black_pieces -= 1
 				
-				self.squares[sq] = checkers.EMPTY
+				self._set_square(sq, checkers.EMPTY)
+
+		piece = self.squares[move.from_square]
+
+		# Clear the source first, a king can finish a jump sequence on the square it started from
+		self._set_square(move.from_square, checkers.EMPTY)
 
-		if move.promotion and not self.squares[move.from_square] & checkers.KING:
-			self.squares[move.to_square] = checkers.KING | (self.squares[move.from_square] & 1)
+		if move.promotion and not piece & checkers.KING:
+			self._set_square(move.to_square, checkers.KING | (piece & 1))
 
 			move.promoted = True
 		else:
-			self.squares[move.to_square] = self.squares[move.from_square]
+			self._set_square(move.to_square, piece)
 
 			move.promoted = False
 
-		self.squares[move.from_square] = checkers.EMPTY
-
 	
 	def undo_move(self, move):
-		self.squares[move.from_square] = self.squares[move.to_square]
+		piece = self.squares[move.to_square]
+
+		self._set_square(move.to_square, checkers.EMPTY)
+
+		# Undo promotion, kings that merely moved onto the back row stay kings
+		if move.promoted:
+			piece = checkers.PIECE | (piece & 1)
 
-		self.squares[move.to_square] = checkers.EMPTY
+		self._set_square(move.from_square, piece)
 
 		# Restore dropped pieces
 		for i in range(len(move.drops)):
-			self.squares[move.drops[i]] = move.dropped[i]
+			self._set_square(move.drops[i], move.dropped[i])
 
 			if move.dropped[i] & 1 == checkers.RED:
 				self.red_pieces += 1
 			else:
 				self.black_pieces += 1
 
-		# Undo promotion
-		if move.promotion:
-			self.squares[move.from_square] = checkers.PIECE | (self.squares[move.from_square] & 1)
-
 	def push(self, move):
+		if type(move) is int:
+			return self.push_packed(move)
+
+		irreversible = type(move) is MultiJump or len(move.drops) > 0 or not self.squares[move.from_square] & checkers.KING
+
 		if type(move) is MultiJump:
 			for m in move.moves:
 				self.do_move(m)
@@ -234,14 +553,22 @@ class Board:
 
 		self.move_stack.append(move)
 
-		self.turn = not self.turn
+		self._switch_turn()
 
-		self.legal_moves = LegalMoveGenerator(self)
+		self._record(irreversible)
+
+		if self.verify_hash:
+			self._verify_hash()
 
 	def pop(self):
 		if len(self.move_stack) == 0:
 			return None
 
+		if type(self.move_stack[-1]) is int:
+			return Move.from_packed(self.pop_packed())
+
+		self._unrecord()
+
 		move = self.move_stack.pop()
 
 		if type(move) is MultiJump:
@@ -250,353 +577,365 @@ class Board:
 		else:
 			self.undo_move(move)
 
-		self.turn = not self.turn
+		self._switch_turn()
 
-		self.legal_moves = LegalMoveGenerator(self)
+		if self.verify_hash:
+			self._verify_hash()
 
 		return move
 
-	def peek(self):
-		if len(self.move_stack) == 0:
-			return None
-		
-		return self.move_stack[-1]
+	# Plays a packed move without creating any Move objects, pop() or pop_packed() takes it back
+	def push_packed(self, packed):
+		from_square = packed & 0x3F
 
-	def is_free(self, square):
-		return square >= 0 and square < 64 and self.squares[square] == checkers.EMPTY
+		to_square = (packed >> 6) & 0x3F
 
-	def calculate_jumps(self, square, up = False, down = False, visited = None, last = None):
-		visited = visited or []
-		
-		if square in visited:
-			return []
-		
-		upper_right = square - 8 + 1
+		piece = self.squares[from_square]
 
-		lower_right = square + 8 + 1
+		# Captured pieces are all the opponent's, so only which of them were kings needs remembering
+		kings = 0
 
-		upper_left = square - 8 - 1
+		for bit in bits((packed >> PACKED_CAPTURES_SHIFT) & 0xFFFFFFFF):
+			square = BIT_SQUARES[bit]
 
-		lower_left = square + 8 - 1
+			if self.squares[square] & checkers.KING:
+				kings |= 1 << bit
 
-		jumps = []
+			if piece & 1 == checkers.RED:
+				self.black_pieces -= 1
+			else:
+				self.red_pieces -= 1
 
-		# APPARENTLY, default arguments always point to the same object
-		visited = visited.copy()
+			self._set_square(square, checkers.EMPTY)
 
-		visited.append(square)
+		self._set_square(from_square, checkers.EMPTY)
 
-		# Temporarily mark square as empty so you can jump onto the same square
-		saved = self.squares[square]
-		
-		self.squares[square] = checkers.EMPTY
+		promoted = packed & PACKED_PROMOTION and not piece & checkers.KING
 
-		# Prevents trying to jump the piece that was just jumped
-		came_from = None
+		self._set_square(to_square, checkers.KING | (piece & 1) if promoted else piece)
 
-		if last:
-			came_from = last.from_square
+		self._packed_undo.append(kings | (1 << 32 if promoted else 0))
 
-		if up and upper_left >= 0 and upper_left < 64 and not self.is_free(upper_left) and self.squares[upper_left] & 1 != self.turn:
-			if self.is_free(upper_left - 8 - 1) and abs(((upper_left - 8 - 1) % 8) - square % 8) < 3 and upper_left - 8 - 1 != came_from:
-				jumps.append(Move(square, upper_left - 8 - 1, [upper_left], last))
-				
-				for j in self.calculate_jumps(upper_left - 8 - 1, up, down, visited, jumps[-1]):
-					jumps.append(j)
+		self.move_stack.append(packed)
 
-				visited.append(upper_left - 8 - 1)
-		
-		if up and upper_right >= 0 and upper_right < 64 and not self.is_free(upper_right) and self.squares[upper_right] & 1 != self.turn:
-			if self.is_free(upper_right - 8 + 1) and abs(((upper_right - 8 + 1) % 8) - square % 8) < 3 and upper_right - 8 + 1 != came_from:
-				jumps.append(Move(square, upper_right - 8 + 1, [upper_right], last))
+		self._switch_turn()
+
+		self._record(packed >> PACKED_CAPTURES_SHIFT & 0xFFFFFFFF or not piece & checkers.KING)
+
+		if self.verify_hash:
+			self._verify_hash()
+
+	# Takes back a move made with push_packed and returns it still packed
+	def pop_packed(self):
+		self._unrecord()
+
+		packed = self.move_stack.pop()
+
+		undo = self._packed_undo.pop()
+
+		from_square = packed & 0x3F
+
+		to_square = (packed >> 6) & 0x3F
+
+		piece = self.squares[to_square]
 
-				for j in self.calculate_jumps(upper_right - 8 + 1, up, down, visited, jumps[-1]):
-					jumps.append(j)
+		self._set_square(to_square, checkers.EMPTY)
 
-				visited.append(upper_right - 8 + 1)
+		self._set_square(from_square, checkers.PIECE | (piece & 1) if undo >> 32 else piece)
 
-		if down and lower_left >= 0 and lower_left < 64 and not self.is_free(lower_left) and self.squares[lower_left] & 1 != self.turn:
-			if self.is_free(lower_left + 8 - 1) and abs(((lower_left + 8 - 1) % 8) - square % 8) < 3 and lower_left + 8 - 1 != came_from:
-				jumps.append(Move(square, lower_left + 8 - 1, [lower_left], last))
+		for bit in bits((packed >> PACKED_CAPTURES_SHIFT) & 0xFFFFFFFF):
+			self._set_square(BIT_SQUARES[bit], (checkers.KING if undo & (1 << bit) else checkers.PIECE) | (not (piece & 1)))
 
-				for j in self.calculate_jumps(lower_left + 8 - 1, up, down, visited, jumps[-1]):
-					jumps.append(j)
+			if piece & 1 == checkers.RED:
+				self.black_pieces += 1
+			else:
+				self.red_pieces += 1
+
+		self._switch_turn()
+
+		if self.verify_hash:
+			self._verify_hash()
 
-				visited.append(lower_left + 8 - 1)
+		return packed
+
+	def peek(self):
+		if len(self.move_stack) == 0:
+			return None
 
+		if type(self.move_stack[-1]) is int:
+			return Move.from_packed(self.move_stack[-1])
 		
-		if down and lower_right >= 0 and lower_right < 64 and not self.is_free(lower_right) and self.squares[lower_right] & 1 != self.turn:
-			if self.is_free(lower_right + 8 + 1) and abs(((lower_right + 8 + 1) % 8) - square % 8) < 3 and lower_right + 8 + 1 != came_from:
-				jumps.append(Move(square, lower_right + 8 + 1, [lower_right], last))
+		return self.move_stack[-1]
 
-				for j in self.calculate_jumps(lower_right + 8 + 1, up, down, visited, jumps[-1]):
-					jumps.append(j)
+	def is_free(self, square):
+		return square >= 0 and square < 64 and self.squares[square] == checkers.EMPTY
 
-				visited.append(lower_right + 8 + 1)
+	# Every complete capture sequence of the piece on square as (path, length), path being a tuple of (from, to, captured) per jump.
+	# Sequences are worked out once per position and square, whichever of the callers below asks first.
+	def generate_captures(self, square, up = None, down = None):
+		piece = self.squares[square]
 
-		self.squares[square] = saved
-						
-		return jumps
-	
-	
-	
-	def count_jumps(self, square, up = False, down = False):
-		potential_jumps = self.calculate_jumps(square, up, down)
+		if up is None:
+			up = piece & 1 == checkers.RED or piece & checkers.KING
 
-		max = 0
+		if down is None:
+			down = piece & 1 == checkers.BLACK or piece & checkers.KING
 
-		for jump in potential_jumps:
-			chain = []
+		if self._captures_hash != self._hash:
+			self._captures_hash = self._hash
 
-			chain.append(jump)
+			self._captures = {}
 
-			taken = 1
+		key = (square, bool(up), bool(down))
 
-			current = jump
+		if key not in self._captures:
+			self._captures[key] = self._find_captures(square, up, down)
 
-			while current.last:
-				taken += 1
-				
-				chain.append(current.last)
+		yield from self._captures[key]
+
+	# Depth first search with an explicit stack. The path so far is one list cut back to the depth of whatever is popped next,
+	# and captured pieces are a bitmask of squares, so nothing gets copied per jump.
+	def _find_captures(self, square, up, down):
+		piece = self.squares[square]
 
-				current = current.last
+		if piece == checkers.EMPTY:
+			return []
 
-			if len(chain) > max:
-				max = len(chain)
+		directions = ((UP_LEFT, UP_RIGHT) if up else ()) + ((DOWN_LEFT, DOWN_RIGHT) if down else ())
 
-		return max
+		found = []
 
-	def get_longest_jump(self, square, up = False, down = False):
-		potential_jumps = self.calculate_jumps(square, up, down)
+		path = []
 
-		max = 0
-		 
-		longest = []
+		stack = [(square, 0, None, 0)]
 
-		for jump in potential_jumps:
-			chain = []
-			
-			chain.append(jump)
+		while stack:
+			current, captured, jump, depth = stack.pop()
 
-			taken = 1
+			del path[depth:]
 
-			current = jump
+			if jump:
+				path.append(jump)
 
-			while current.last:
-				taken += 1
-				
-				chain.append(current.last)
+			extended = False
 
-				current = current.last
+			for direction in directions:
+				target = JUMP_SQUARES[direction][current]
 
-			if len(chain) > max:
-				max = len(chain)
+				if target < 0:
+					continue
 
-				longest = chain
+				over = NEIGHBOR_SQUARES[direction][current]
 
-		longest.reverse()
+				if captured >> over & 1:
+					continue
 
-		return longest
-	
-	
-	def _jumps_to_square(self, move, king):
-		up = self.squares[move.from_square] & 1 == checkers.RED
+				victim = self.squares[over]
 
-		down = self.squares[move.from_square] & 1 == checkers.BLACK
-		
-		potential_jumps = [j for j in self.calculate_jumps(move.from_square, up or self.squares[move.from_square] & checkers.KING, down or self.squares[move.from_square] & checkers.KING)]
+				# The moving piece has left its square, so jumping back onto it is fine
+				if victim == checkers.EMPTY or victim & 1 == piece & 1 or (self.squares[target] != checkers.EMPTY and target != square):
+					continue
 
-		# Filter out weird duplicates
-		jumps = []
+				stack.append((target, captured | 1 << over, (current, target, over), len(path)))
 
-		def filter_path(mp):
-			if str(mp) in jumps:
-				return False
+				extended = True
 
-			jumps.append(str(mp))
-			
-			if type(move) is MultiJump:
-				for m in move.moves:
-					if m.from_square == mp.from_square and m.to_square == mp.to_square:
-						return True
+			if not extended and path:
+				found.append((tuple(path), len(path)))
 
-				return False
-			else:
-				return mp.to_square == move.to_square
+		return found
 
-		
-		return [j for j in potential_jumps if filter_path(j)]
-	
-	def is_legal(self, move):
-		source = self.squares[move.from_square]
+	# Linked Move objects for every jump of every sequence, each pointing at the jump before it through last
+	def _jump_nodes(self, square, up, down, last = None):
+		nodes = {}
 
-		target = self.squares[move.to_square]
+		for path, length in self.generate_captures(square, up, down):
+			previous = last
 
-		pos = checkers.index_to_square(move.from_square)
+			for i in range(length):
+				if path[:i + 1] not in nodes:
+					frm, to, over = path[i]
 
-		to = checkers.index_to_square(move.to_square)
-		
-		if target != checkers.EMPTY:
-			return False
+					nodes[path[:i + 1]] = Move(frm, to, [over], previous)
 
-		if source & 1 != self.turn:
-			return False
+				previous = nodes[path[:i + 1]]
 
-		up = self.squares[move.from_square] & 1 == checkers.RED
-		down = self.squares[move.from_square] & 1 == checkers.BLACK
+		return list(nodes.values())
 
-		jumps_taken = len(move.moves) if type(move) is MultiJump else 1
-		
-		if self.require_all_jumps and self.count_jumps(move.from_square, up or source & checkers.KING, down or source & checkers.KING) > jumps_taken:
-			return False
+	def calculate_jumps(self, square, up = False, down = False, visited = None, last = None):
+		return self._jump_nodes(square, up, down, last)
+
+	def count_jumps(self, square, up = False, down = False):
+		return max((length for path, length in self.generate_captures(square, up, down)), default = 0)
+
+	def get_longest_jump(self, square, up = False, down = False):
+		longest = None
+
+		for path, length in self.generate_captures(square, up, down):
+			if longest is None or length > len(longest):
+				longest = path
+
+		chain = []
 
-		potential_jumps = sorted(self._jumps_to_square(move, source & checkers.KING), key = lambda jump: abs(jump.from_square - move.from_square))
+		for frm, to, over in longest or ():
+			chain.append(Move(frm, to, [over], chain[-1] if chain else None))
 
+		return chain
+	
+	def _jumps_to_square(self, move, king):
 		if type(move) is MultiJump:
-			for i in range(len(move.moves)):
-				m = move.moves[i]
-				
-				if len([mm for mm in potential_jumps if mm.from_square == m.from_square and mm.to_square == m.to_square]) == 0:
-					return False
+			hops = set((m.from_square, m.to_square) for m in move.moves)
 
-			return True
+			return [jump for jump in self._jump_nodes(move.from_square, None, None) if (jump.from_square, jump.to_square) in hops]
 
-		if len(potential_jumps) > 1 and len([mm for mm in potential_jumps if mm.from_square == move.from_square and mm.to_square == move.to_square]) == 0:
-			return False
+		return [jump for jump in self._jump_nodes(move.from_square, None, None) if jump.to_square == move.to_square]
+	
+	# Legal moves of the current position by the squares they pass through, generated on first use.
+	# The cache belongs to one position, any push or pop changes the hash and the next call starts over.
+	# The rule flags change which moves are legal without changing the Zobrist key, so they are part of the cache key
+	def _legal_cache_key(self):
+		return (self._hash, self.require_jumps, self.require_all_jumps)
 
-		if pos[0] == to[0]:
-			return False
+	def _legal_by_path(self):
+		if self._legal_key != self._legal_cache_key():
+			self._legal_key = self._legal_cache_key()
 
-		if abs("ABCDEFGH".index(pos[0]) - "ABCDEFGH".index(to[0])) > 1 or abs(int(pos[1]) - int(to[1])) > 1:
-			return False
+			self._legal = {}
 
-		if pos[1] == to[1]:
-			return False
+			for move in self.generate_legal_moves():
+				self._legal[_move_path(move)] = move
 
-		if self.turn == checkers.RED:
-			if int(to[1]) < int(pos[1]) and not source & checkers.KING:
-				return False
-		else:
-			if int(to[1]) > int(pos[1]) and not source & checkers.KING:
-				return False
+		return self._legal
 
-		if self.require_jumps and self.has_jump(self.turn):
-			return False
+	# The generated legal move matching move, which may leave out what it captures. A plain Move
+	# from a piece to where a capture sequence ends stands for that sequence if there's only one.
+	def _find_legal(self, move):
+		legal = self._legal_by_path()
 
-		return True
-	
-	def parse_uci(self, uci):
-		move = checkers.Move.from_uci(uci)
+		path = _move_path(move)
 
-		if not self.is_legal(move):
-			try:
-				self.play_move(move)
+		if path in legal:
+			return legal[path]
 
-				self.pop()
-			except Exception as e:
-				raise e
+		if type(move) is not MultiJump:
+			matches = [m for p, m in legal.items() if p[0] == path[0] and p[-1] == path[-1]]
+
+			if len(matches) > 1:
+				raise checkers.AmbiguousMoveError("Ambiguous move.")
+
+			if matches:
+				return matches[0]
+
+		return None
+
+	# Same as _find_legal, but explains why a move isn't legal instead of returning None
+	def _resolve(self, move):
+		legal = self._find_legal(move)
+
+		if legal is not None:
+			return legal
 
-		return move
-	
-	def play_move(self, move):
-		move.drops = []
-		
 		source = self.squares[move.from_square]
 
-		target = self.squares[move.to_square]
+		if source == checkers.EMPTY:
+			raise checkers.IllegalMoveError("There is no piece to move.")
 
 		if source & 1 != self.turn:
 			raise checkers.IllegalMoveError(f"It is not {'reds' if source & 1 else 'blacks'} turn to move.")
 
-		pos = checkers.index_to_square(move.from_square)
-
-		to = checkers.index_to_square(move.to_square)
-
-		if target != checkers.EMPTY and move.to_square != move.from_square:
+		if self.squares[move.to_square] != checkers.EMPTY and move.to_square != move.from_square:
 			raise checkers.IllegalMoveError("Target square is not empty.")
-		
-		rows = "ABCDEFGH"
-
-		up = self.squares[move.from_square] & 1 == checkers.RED
-		down = self.squares[move.from_square] & 1 == checkers.BLACK
 
-		jumps_taken = len(move.moves) if type(move) is MultiJump else 1
+		path = _move_path(move)
 
-		print(self.count_jumps(move.from_square, up or source & checkers.KING, down or source & checkers.KING), jumps_taken)
-		
-		if self.require_all_jumps and self.count_jumps(move.from_square, up or source & checkers.KING, down or source & checkers.KING) > jumps_taken:
+		if any(len(p) > len(path) and p[:len(path)] == path for p in self._legal_by_path()):
 			raise checkers.IllegalMoveError("All jumps must be taken.")
 
-		# Filter the list of potential jumps to jumps that end in the target square
-		# Sort the list of potential jumps by distance
-		potential_jumps = sorted(self._jumps_to_square(move, source & checkers.KING), key = lambda jump: abs(jump.from_square - move.from_square))
+		if any(type(m) is MultiJump for m in self._legal_by_path().values()):
+			raise checkers.IllegalMoveError("Illegal move. (A jump is available and must be taken)")
 
-		if type(move) is MultiJump:
-			populated = MultiJump([])
-			
-			for i in range(len(move.moves)):
-				m = move.moves[i]
-				
-				if len([mm for mm in potential_jumps if mm.from_square == m.from_square and mm.to_square == m.to_square]) == 0:
-					raise checkers.IllegalMoveError("Invalid path to target square.")
+		raise checkers.IllegalMoveError("Illegal move.")
+
+	def is_legal(self, move):
+		try:
+			return self._find_legal(move) is not None
+		except checkers.AmbiguousMoveError:
+			return False
 
-				ptnmove = [mm for mm in potential_jumps if mm.from_square == m.from_square and mm.to_square == m.to_square][0]
+	# Returns the legal move the uci string stands for, raising the reason it can't be played otherwise
+	def parse_uci(self, uci):
+		return self._resolve(checkers.Move.from_uci(uci))
+	
+	def play_move(self, move):
+		legal = self._resolve(move)
 
-				# Get the potential jump that matches this move
-				self.do_move(ptnmove)
+		# Tell the caller what their move captured
+		move.drops = [square for m in (legal.moves if type(legal) is MultiJump else [legal]) for square in m.drops]
 
-				populated.moves.append(ptnmove)
+		self.push(legal)
 
-				move.drops += ptnmove.drops
+	
+	# Capture sequences of the piece on square as lists of single jumps, every prefix as well unless require_all_jumps is set
+	def _capture_chains(self, square):
+		paths = []
 
-			self.move_stack.append(populated)
+		for path, length in self.generate_captures(square):
+			if self.require_all_jumps:
+				paths.append(path)
+			else:
+				paths += [path[:i + 1] for i in range(length) if path[:i + 1] not in paths]
 
-			self.turn = not self.turn
+		return [[Move(frm, to, [over]) for frm, to, over in path] for path in paths]
 
-			return
+	# Single step moves of the piece on square
+	def _simple_moves(self, square):
+		piece = self.squares[square]
 
-		if len(potential_jumps) > 1 and len([mm for mm in potential_jumps if mm.from_square == move.from_square and mm.to_square == move.to_square]) == 0:
-			raise checkers.InvalidMoveError("Ambiguous move.")
+		if piece & checkers.KING:
+			directions = ALL_DIRECTIONS
+		elif piece & 1 == checkers.RED:
+			directions = (UP_LEFT, UP_RIGHT)
+		else:
+			directions = (DOWN_LEFT, DOWN_RIGHT)
 
-		if len(potential_jumps) > 0:
-			chain = []
+		for direction in directions:
+			target = NEIGHBOR_SQUARES[direction][square]
 
-			jump = potential_jumps[0]
+			if target >= 0 and self.squares[target] == checkers.EMPTY:
+				yield Move(square, target)
 
-			chain.append(jump)
+	# Yields every legal move for the side to move, captures first.
+	# Captures for the whole position are found up front since they decide whether simple moves are allowed at all.
+	def generate_legal_moves(self):
+		pieces = self.get_player_pieces(self.turn)
 
-			while jump.last:
-				chain.append(jump.last)
+		captures = []
 
-				jump = jump.last
+		for square in pieces:
+			for chain in self._capture_chains(square):
+				captures.append(MultiJump(chain))
 
-			for m in reversed(chain):
-				move.drops.append(*m.drops)
-				self.push(m)
+		yield from captures
 
+		if self.require_jumps and captures:
 			return
 
-		# If the columns match it's not a diagonal move
-		if pos[0] == to[0]:
-			raise checkers.IllegalMoveError("Illegal move.")
+		for square in pieces:
+			yield from self._simple_moves(square)
 
-		# If the row or columns are too far away it's an invalid move
-		if abs(rows.index(pos[0]) - rows.index(to[0])) > 1 or abs(int(pos[1]) - int(to[1])) > 1:
-			raise checkers.IllegalMoveError("Illegal move.")
+	# Same moves in the same order as generate_legal_moves, packed. A king can go round a circle of captures either way,
+	# which is two moves here but one packed move, so only the first is kept, as BitBoard.generate_packed_moves does.
+	def generate_packed_moves(self):
+		seen = set()
 
-		if self.turn == checkers.RED:
-			if int(to[1]) < int(pos[1]) and not source & checkers.KING:
-				raise checkers.IllegalMoveError("Illegal move. (Cannot move backwards as a normal piece)")
-		else:
-			if int(to[1]) > int(pos[1]) and not source & checkers.KING:
-				raise checkers.IllegalMoveError("Illegal move. (Cannot move backwards as a normal piece)")
+		for move in self.generate_legal_moves():
+			packed = move.pack()
 
-		if self.require_jumps and self.has_jump(self.turn):
-			raise checkers.IllegalMoveError("Illegal move. (A jump is available and must be taken)")
+			if packed not in seen:
+				seen.add(packed)
 
-		self.push(move)
+				yield packed
 
-	
 	def has_jump(self, player):
 		for square in self.get_player_pieces(player):
 			up = self.squares[square] & 1 == checkers.RED
@@ -608,11 +947,38 @@ class Board:
 
 		return False
 
-	
+	# Stops at the first simple move found
+	def has_simple_move(self, player):
+		return any(next(self._simple_moves(square), None) for square in self.get_player_pieces(player))
+
+	# Whether the side to move can move at all, without generating the moves. Any capture or simple move will do since
+	# forced captures only decide which moves are legal, not whether there are some.
+	def has_legal_moves(self):
+		if self._legal_key == self._legal_cache_key():
+			return len(self._legal) > 0
+
+		return self.has_jump(self.turn) or self.has_simple_move(self.turn)
+
+	# How often the current position has come up since the history was last reset, itself included
+	def repetition_count(self):
+		return self._repetitions.get(self._hash, 0)
+
+	def is_repetition(self, count = None):
+		count = count or self.repetition_limit
+
+		return count is not None and self.repetition_count() >= count
+
+	def is_move_limit(self):
+		return self.move_limit is not None and self.halfmove_clock >= self.move_limit
+
+	def is_draw(self):
+		return self.is_repetition() or self.is_move_limit()
+
+	# Over when a side has no pieces left, the side to move can't move or it is a draw
 	def is_game_over(self):
-		return self.red_pieces == 0 or self.black_pieces == 0
+		return self.red_pieces == 0 or self.black_pieces == 0 or not self.has_legal_moves() or self.is_draw()
 
-	
+	# The side that can't move has lost, a game that isn't over or was drawn has no winner
 	def winner(self):
 		if self.black_pieces == 0:
 			return checkers.RED
@@ -620,81 +986,72 @@ class Board:
 		if self.red_pieces == 0:
 			return checkers.BLACK
 
-		return None
-		
+		if not self.has_legal_moves():
+			return not self.turn
 
+		return None
 
 class LegalMoveGenerator:
+	# Lazy view of the legal moves of the board's current position, like py-chess's. Nothing is generated until the moves
+	# are asked for. The moves are the ones Board._legal_by_path keeps for is_legal and play_move, so push/pop cost nothing,
+	# a position is only ever generated once and the view always agrees with `in`, which goes through Board.is_legal and
+	# understands from/to shorthand for captures.
 	def __init__(self, board, any = False):
 		self.board = board
 
-		self.piece_index = 0
+		# Kept for compatibility, moves are only ever generated for the side to move
+		self.any = any
 
-		self.pieces = self.board.get_pieces()
+		self._moves = None
 
-		self.visited = []
+		# The board's dict the list was taken from, a new one means the moves were generated again
+		self._source = None
 
-		# A list of already known valid moves that haven't been returned yet
-		self.queued = []
+		# For next(), which walks the moves one at a time like the generator this used to be
+		self._iterator = None
 
-		# If true, then the generator will return valid moves that either player can make instead of just the current turn
-		self.any = any
+	def _list(self):
+		legal = self.board._legal_by_path()
 
-	def __iter__(self):
-		return self
+		if self._moves is None or self._source is not legal:
+			self._moves = list(legal.values())
 
-	def next(self):
-		turn = self.board.turn
+			self._source = legal
 
-		def scan(frm):
-			_rows = "ABCDEFGH"
+			self._iterator = None
 
-			_col = 1
-			
-			_c = 0
-			
-			for i in reversed(range(64)):
-				move = Move(checkers.SQUARES[frm], checkers.SQUARES[f"{_rows[i % 8]}{_col}"])
+		return self._moves
 
-				if self.board.is_legal(move) and not move.uci() in self.visited:
-					self.visited.append(move.uci())
+	# For when squares were changed without going through push/pop or load_fen, see Board.resync
+	def invalidate(self):
+		self.board.resync()
 
-					return move
-			
-				_c += 1
-			
-				if _c == 8:
-					_c = 0
-					_col += 1
+		self._moves = None
 
-			return None
+		self._iterator = None
 
-		result = None
-		
-		for i in self.board.get_player_pieces(self.board.turn):
-			if self.board.squares[i] != checkers.EMPTY:
-				up = self.board.squares[i] & 1 == checkers.RED
-				down = self.board.squares[i] & 1 == checkers.BLACK
-		
-				jumps = self.board.get_longest_jump(i, up or self.board.squares[i] & checkers.KING, down or self.board.squares[i] & checkers.KING)
-				
-				if len(jumps) > 0:
-					move = MultiJump(jumps)
+	def __iter__(self):
+		return iter(self._list())
 
-					if not move.uci() in self.visited:
-						self.visited.append(move.uci())
-	
-						return move
-				
-				result = scan(checkers.index_to_square(i))
-	
-				if result != None:
-					break
+	def __len__(self):
+		return len(self._list())
 
-		if result == None:
-			raise StopIteration()
+	def __bool__(self):
+		return bool(self._list())
 
-		return result
+	def __contains__(self, move):
+		return self.board.is_legal(move)
+
+	def next(self):
+		moves = self._list()
+
+		if self._iterator is None:
+			self._iterator = iter(moves)
+
+		return next(self._iterator)
 
 	def __next__(self):
-		return self.next()
\ No newline at end of file
+		return self.next()
+
+	def __repr__(self):
+		return f"<LegalMoveGenerator {[move.uci() for move in self._list()]}>"
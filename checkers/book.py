@@ -0,0 +1,226 @@
+import checkers
+
+from checkers import codec, pdn
+from checkers.board import Move
+
+import argparse
+import mmap
+import random
+import struct
+import sys
+
+# Opening book, a sorted file of fixed size records so a lookup is a binary search over a memory map and nothing has to be
+# loaded first. After the header every record is
+#
+#   position   13 bytes   checkers.codec key, big-endian so the bytes sort the way the keys do
+#   move        8 bytes   packed move (see checkers.board)
+#   count       4 bytes   games that played the move here
+#   score       4 bytes   points the mover scored in them, 2 for a win and 1 for a draw
+#
+# with the records of one position next to each other.
+
+MAGIC = b"CKBOOK01"
+
+_RECORD = struct.Struct("<13sQII")
+
+RECORD_BYTES = _RECORD.size
+
+# Only this many plies of every game go into a book by default
+DEFAULT_PLIES = 16
+
+# Points for the side that played first (PDN Black, red here) from a PDN result, None when it's unknown
+_RESULT_POINTS = {
+	"0-1": 2,
+	"1-0": 0,
+	"0-2": 2,
+	"2-0": 0,
+	"1/2-1/2": 1,
+	"1-1": 1
+}
+
+class BookEntry:
+	def __init__(self, move, count, score):
+		self.move = move
+
+		self.count = count
+
+		self.score = score
+
+	# Popularity scaled by results, every game counts 1 and the mover's points on top, so a move never won with can still come up
+	@property
+	def weight(self):
+		return self.count + self.score
+
+	def __repr__(self):
+		return f"<BookEntry {self.move} count={self.count} score={self.score}>"
+
+class Book:
+	def __init__(self, path):
+		self.path = path
+
+		with open(path, "rb") as file:
+			self._map = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+
+		if self._map[:len(MAGIC)] != MAGIC:
+			self._map.close()
+
+			raise ValueError("Not an opening book: " + path)
+
+		self.records = (len(self._map) - len(MAGIC)) // RECORD_BYTES
+
+	def _key(self, i):
+		offset = len(MAGIC) + i * RECORD_BYTES
+
+		return self._map[offset:offset + codec.POSITION_BYTES]
+
+	# Book moves of the position, most weight first. Empty when the position isn't in the book.
+	def probe(self, board):
+		key = codec.encode(board).to_bytes(codec.POSITION_BYTES, "big")
+
+		low = 0
+
+		high = self.records
+
+		while low < high:
+			middle = (low + high) // 2
+
+			if self._key(middle) < key:
+				low = middle + 1
+			else:
+				high = middle
+
+		entries = []
+
+		while low < self.records and self._key(low) == key:
+			_, packed, count, score = _RECORD.unpack_from(self._map, len(MAGIC) + low * RECORD_BYTES)
+
+			entries.append(BookEntry(Move.from_packed(packed), count, score))
+
+			low += 1
+
+		entries.sort(key = lambda entry: -entry.weight)
+
+		return entries
+
+	# A book move picked at random in proportion to weight, or None when the position isn't in the book
+	def choose(self, board, rng = random):
+		entries = self.probe(board)
+
+		if not entries:
+			return None
+
+		return rng.choices(entries, weights = [entry.weight for entry in entries])[0].move
+
+	def __contains__(self, board):
+		return bool(self.probe(board))
+
+	def __len__(self):
+		return self.records
+
+	def close(self):
+		self._map.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+# Counts every (position, move) of the first plies of each pdn.Game. Games from self-play can go through pdn.Game.from_board.
+# Games whose FEN tag or moves don't parse, or with a move that isn't legal, are skipped, with (game, error) appended to
+# skipped if it is given.
+def collect(games, plies = DEFAULT_PLIES, counts = None, skipped = None):
+	counts = counts if counts is not None else {}
+
+	for game in games:
+		points = _RESULT_POINTS.get(game.result)
+
+		# Counted only once the whole game has played through, so a bad game leaves nothing behind
+		played = []
+
+		try:
+			board = game.board()
+
+			for text in game.moves[:plies]:
+				key = codec.encode(board)
+
+				mover = board.turn
+
+				board.play_move(pdn.parse_move(text))
+
+				played.append((key, board.peek().pack(), mover))
+		except (checkers.InvalidFenError, checkers.InvalidMoveError, checkers.IllegalMoveError, checkers.AmbiguousMoveError) as e:
+			# One broken game in an archive shouldn't stop the build, it is left out and handed back in skipped
+			if skipped is not None:
+				skipped.append((game, e))
+
+			continue
+
+		for key, move, mover in played:
+			entry = counts.setdefault((key, move), [0, 0])
+
+			entry[0] += 1
+
+			if points is not None:
+				entry[1] += points if mover == checkers.RED else 2 - points
+			else:
+				entry[1] += 1
+
+	return counts
+
+# Writes counts from collect() as a book, leaving out moves played fewer than min_count times
+def write(counts, path, min_count = 1):
+	records = sorted((key.to_bytes(codec.POSITION_BYTES, "big"), move, count, score) for (key, move), (count, score) in counts.items() if count >= min_count)
+
+	with open(path, "wb") as file:
+		file.write(MAGIC)
+
+		for record in records:
+			file.write(_RECORD.pack(*record))
+
+	return len(records)
+
+def build(games, path, plies = DEFAULT_PLIES, min_count = 1, skipped = None):
+	return write(collect(games, plies, None, skipped), path, min_count)
+
+def main(argv = None):
+	parser = argparse.ArgumentParser(prog = "python -m checkers.book", description = "Opening books from PDN files")
+
+	parser.add_argument("book")
+
+	parser.add_argument("pdn", nargs = "*", help = "PDN files to build the book from, leave out to list the book moves of --fen")
+
+	parser.add_argument("--plies", type = int, default = DEFAULT_PLIES)
+
+	parser.add_argument("--min-count", type = int, default = 1)
+
+	parser.add_argument("--fen", default = None, help = "position to look up, the starting position by default")
+
+	args = parser.parse_args(argv)
+
+	if args.pdn:
+		counts = {}
+
+		skipped = []
+
+		for filename in args.pdn:
+			with open(filename) as file:
+				collect(pdn.read_games(file), args.plies, counts, skipped)
+
+		print(write(counts, args.book, args.min_count), "moves")
+
+		if skipped:
+			print(len(skipped), "games skipped, first:", skipped[0][1])
+
+		return 0
+
+	with Book(args.book) as book:
+		board = checkers.Board(args.fen) if args.fen else checkers.Board()
+
+		for entry in book.probe(board):
+			print(pdn.move_to_pdn(entry.move), entry.count, entry.score)
+
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
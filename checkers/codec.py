@@ -0,0 +1,84 @@
+import checkers
+
+from checkers.squares import BIT_SQUARES, SQUARE_BITS
+
+# Fixed width binary positions. Two bits a square can't tell a man from a king of either colour, so a position is three
+# 32-bit masks over the dark squares (bit n is bit n of checkers.squares) and the side to move:
+#
+#   red      bits 0-31
+#   black    bits 32-63
+#   kings    bits 64-95
+#   turn     bit 96, set when black is to move
+#
+# encode gives that as one int, which hashes quickly and makes a canonical dict key, to_bytes as POSITION_BYTES
+# little-endian bytes for files and arrays. Move stacks and rule flags aren't part of a position.
+
+POSITION_BYTES = 13
+
+TURN_BIT = 1 << 96
+
+MASK = (1 << 32) - 1
+
+def masks(board):
+	# BitBoard already has them
+	if isinstance(board, checkers.BitBoard):
+		return board.red_mask, board.black_mask, board.king_mask
+
+	return square_masks(board.squares)
+
+# Red, black and king masks of a Board.squares list
+def square_masks(squares):
+	red = black = kings = 0
+
+	for bit in range(32):
+		piece = squares[BIT_SQUARES[bit]]
+
+		if piece == checkers.EMPTY:
+			continue
+
+		if piece & 1 == checkers.RED:
+			red |= 1 << bit
+		else:
+			black |= 1 << bit
+
+		if piece & checkers.KING:
+			kings |= 1 << bit
+
+	return red, black, kings
+
+def encode(board):
+	red, black, kings = masks(board)
+
+	return red | black << 32 | kings << 64 | (TURN_BIT if board.turn == checkers.BLACK else 0)
+
+def decode(key, board_class = checkers.Board):
+	return board_class(to_fen(key))
+
+def to_fen(key):
+	red = key & MASK
+
+	black = (key >> 32) & MASK
+
+	kings = (key >> 64) & MASK
+
+	characters = []
+
+	for square in range(64):
+		bit = SQUARE_BITS[square]
+
+		if bit < 0 or not (red | black) >> bit & 1:
+			characters.append("-")
+		elif red >> bit & 1:
+			characters.append("k" if kings >> bit & 1 else "p")
+		else:
+			characters.append("K" if kings >> bit & 1 else "P")
+
+	layout = "/".join("".join(characters[row * 8:row * 8 + 8]) for row in range(8))
+
+	return layout + (" b" if key & TURN_BIT else " r")
+
+def to_bytes(key):
+	return key.to_bytes(POSITION_BYTES, "little")
+
+def from_bytes(data):
+	return int.from_bytes(data[:POSITION_BYTES], "little")
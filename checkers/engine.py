@@ -0,0 +1,352 @@
+import checkers
+
+from checkers.board import Move
+
+from checkers.squares import SQUARE_ROWS, SQUARE_COLS
+
+from checkers.tablebase import MAX_PLIES as TABLEBASE_MAX_PLIES
+
+from checkers.transposition import TranspositionTable, EXACT, LOWER, UPPER, MOVE_MASK
+
+import time
+
+# Scores are in hundredths of a man from the point of view of the side to move.
+# A side without legal moves has lost, WIN - ply prefers the quickest win and the slowest loss.
+# Repeating a position already on the board's history or reaching its move limit scores 0, a draw.
+WIN = 1000000
+
+INFINITY = WIN + 1
+
+MAX_DEPTH = 64
+
+# Scores past this are won or lost games: a loss found in the search at most MAX_DEPTH plies down, or a tablebase result
+# up to TABLEBASE_MAX_PLIES further on from there
+MATE_BOUND = WIN - MAX_DEPTH - TABLEBASE_MAX_PLIES
+
+# Used when search() is given neither a depth nor a time or node limit
+DEFAULT_DEPTH = 6
+
+# How many nodes pass between clock checks
+CHECK_INTERVAL = 1024
+
+class Evaluator:
+	# Material from the piece counts plus king and positional weights, all in hundredths of a man.
+	# Any callable taking a board and returning a score for the side to move can be used in its place.
+
+	def __init__(self, man = 100, king = 150, advancement = 2, center = 3, back_rank = 6):
+		self.man = man
+
+		self.king = king
+
+		# Per square bonus for red men, black men and kings. Men gain for every row advanced, for the middle
+		# of the board and for staying on their own back row where they stop the opponent crowning.
+		self.red_table = [0] * 64
+
+		self.black_table = [0] * 64
+
+		self.king_table = [0] * 64
+
+		for square in range(64):
+			row = SQUARE_ROWS[square]
+
+			col = SQUARE_COLS[square]
+
+			central = center if 2 <= row <= 5 and 2 <= col <= 5 else 0
+
+			self.red_table[square] = advancement * (7 - row) + central + (back_rank if row == 7 else 0)
+
+			self.black_table[square] = advancement * row + central + (back_rank if row == 0 else 0)
+
+			# Kings are strongest in the middle and weakest stuck on an edge
+			self.king_table[square] = central - (center if col in (0, 7) else 0)
+
+	def __call__(self, board):
+		score = (board.red_pieces - board.black_pieces) * self.man
+
+		squares = board.squares
+
+		for square in range(64):
+			piece = squares[square]
+
+			if piece == checkers.EMPTY:
+				continue
+
+			if piece & checkers.KING:
+				value = self.king - self.man + self.king_table[square]
+			elif piece & 1 == checkers.RED:
+				value = self.red_table[square]
+			else:
+				value = self.black_table[square]
+
+			score += value if piece & 1 == checkers.RED else -value
+
+		return score if board.turn == checkers.RED else -score
+
+evaluate = Evaluator()
+
+class SearchResult:
+	def __init__(self, move, score, depth, pv, nodes, seconds):
+		self.move = move
+
+		self.score = score
+
+		self.depth = depth
+
+		# Principal variation, best play for both sides starting with move
+		self.pv = pv
+
+		self.nodes = nodes
+
+		self.seconds = seconds
+
+	@property
+	def nps(self):
+		return self.nodes / self.seconds if self.seconds > 0 else 0.0
+
+	def __repr__(self):
+		return f"<SearchResult {self.move} score={self.score} depth={self.depth} nodes={self.nodes} pv={[move.uci() for move in self.pv]}>"
+
+class _SearchAborted(Exception):
+	pass
+
+# Win scores are stored relative to the node rather than the root, so they stay right when the position turns up at another ply
+def _score_to_table(score, ply):
+	if score >= MATE_BOUND:
+		return score + ply
+
+	if score <= -MATE_BOUND:
+		return score - ply
+
+	return score
+
+def _score_from_table(score, ply):
+	if score >= MATE_BOUND:
+		return score - ply
+
+	if score <= -MATE_BOUND:
+		return score + ply
+
+	return score
+
+# (result, plies) from a tablebase probe as a search score, the game ends plies moves after this node
+def _tablebase_score(entry, ply):
+	result, plies = entry
+
+	if result == 0:
+		return 0
+
+	return WIN - ply - plies if result > 0 else -WIN + ply + plies
+
+class Engine:
+	# Keep one Engine per game so the transposition table carries over between moves, call new_game() before the next one
+	def __init__(self, evaluate = evaluate, table = None, tablebase = None, book = None):
+		self.evaluate = evaluate
+
+		self.table = table if table is not None else TranspositionTable()
+
+		# checkers.tablebase.Tablebase, positions it covers get their exact score instead of being searched
+		self.tablebase = tablebase
+
+		# checkers.book.Book, search() plays a book move straight away when there is one
+		self.book = book
+
+		self.nodes = 0
+
+		self._deadline = None
+
+		self._node_limit = None
+
+	# Iterative deepening negamax, returns the result of the deepest iteration that finished or None without legal moves.
+	# The board is left as it was, even when a limit interrupts the search. Moves are packed ints (see checkers.board)
+	# all the way through and only the returned move and PV are turned into Move objects.
+	def search(self, board, depth = None, time_limit = None, node_limit = None):
+		if depth is None:
+			depth = MAX_DEPTH if time_limit or node_limit else DEFAULT_DEPTH
+
+		start = time.perf_counter()
+
+		self.nodes = 0
+
+		self._deadline = start + time_limit if time_limit else None
+
+		self._node_limit = node_limit
+
+		self.table.new_search()
+
+		if self.book is not None:
+			move = self.book.choose(board)
+
+			if move is not None:
+				return SearchResult(move, 0, 0, [move], 0, time.perf_counter() - start)
+
+		stack_size = len(board.move_stack)
+
+		moves = list(board.generate_packed_moves())
+
+		if not moves:
+			return None
+
+		# Something to play even if the first iteration doesn't finish
+		best_score = 0
+
+		best_depth = 0
+
+		best_pv = [moves[0]]
+
+		for current in range(1, depth + 1):
+			try:
+				score, pv = self._negamax(board, current, -INFINITY, INFINITY, 0, best_pv)
+			except _SearchAborted:
+				while len(board.move_stack) > stack_size:
+					board.pop_packed()
+
+				break
+
+			best_score = score
+
+			best_depth = current
+
+			best_pv = pv
+
+			# Nothing deeper changes a forced result or the only legal move
+			if abs(score) >= WIN - MAX_DEPTH or len(moves) == 1:
+				break
+
+		pv = [Move.from_packed(move) for move in best_pv]
+
+		return SearchResult(pv[0], best_score, best_depth, pv, self.nodes, time.perf_counter() - start)
+
+	def _visit(self):
+		self.nodes += 1
+
+		if self._node_limit and self.nodes > self._node_limit:
+			raise _SearchAborted()
+
+		if self._deadline and self.nodes % CHECK_INTERVAL == 0 and time.perf_counter() > self._deadline:
+			raise _SearchAborted()
+
+	def new_game(self):
+		self.table.clear()
+
+	# The previous PV move goes first, otherwise the best move the table remembers for the position
+	def _order(self, moves, hint, table_move):
+		if hint and hint[0] in moves:
+			moves.remove(hint[0])
+
+			moves.insert(0, hint[0])
+
+			return moves
+
+		if table_move:
+			for i in range(len(moves)):
+				if moves[i] & MOVE_MASK == table_move:
+					moves.insert(0, moves.pop(i))
+
+					return moves
+
+		return moves
+
+	def _negamax(self, board, depth, alpha, beta, ply, hint):
+		self._visit()
+
+		# A position that came up before can be repeated for ever, so the side that is worse off treats it as a draw already
+		if ply > 0 and (board.repetition_count() > 1 or board.is_move_limit()):
+			return 0, []
+
+		if ply > 0 and self.tablebase is not None:
+			entry = self.tablebase.probe(board)
+
+			if entry is not None:
+				return _tablebase_score(entry, ply), []
+
+		if depth <= 0:
+			return self._quiescence(board, alpha, beta, ply), []
+
+		key = board.zobrist_hash()
+
+		entry = self.table.probe(key)
+
+		table_move = 0
+
+		if entry:
+			table_depth, bound, score, table_move = entry
+
+			# The root always searches so it has a move and PV to return
+			if ply > 0 and table_depth >= depth:
+				score = _score_from_table(score, ply)
+
+				if bound == EXACT or (bound == LOWER and score >= beta) or (bound == UPPER and score <= alpha):
+					return score, []
+
+		moves = list(board.generate_packed_moves())
+
+		if not moves:
+			return -WIN + ply, []
+
+		original_alpha = alpha
+
+		best_score = -INFINITY
+
+		best_line = []
+
+		for move in self._order(moves, hint, table_move):
+			board.push_packed(move)
+
+			# Only the first move follows the previous PV any further
+			score, line = self._negamax(board, depth - 1, -beta, -alpha, ply + 1, hint[1:] if hint and move == hint[0] else None)
+
+			board.pop_packed()
+
+			score = -score
+
+			if score > best_score:
+				best_score = score
+
+				best_line = [move] + line
+
+			if score > alpha:
+				alpha = score
+
+			if alpha >= beta:
+				break
+
+		if best_score <= original_alpha:
+			bound = UPPER
+		elif best_score >= beta:
+			bound = LOWER
+		else:
+			bound = EXACT
+
+		self.table.store(key, depth, bound, _score_to_table(best_score, ply), best_line[0] & MOVE_MASK)
+
+		return best_score, best_line
+
+	# Captures are forced, so a position isn't scored until the side to move has none. There is no standing pat.
+	def _quiescence(self, board, alpha, beta, ply):
+		if not board.has_jump(board.turn):
+			return self.evaluate(board)
+
+		best_score = -INFINITY
+
+		for move in list(board.generate_packed_moves()):
+			self._visit()
+
+			board.push_packed(move)
+
+			score = -self._quiescence(board, -beta, -alpha, ply + 1)
+
+			board.pop_packed()
+
+			if score > best_score:
+				best_score = score
+
+			if score > alpha:
+				alpha = score
+
+			if alpha >= beta:
+				break
+
+		return best_score
+
+def search(board, depth = None, time_limit = None, node_limit = None, evaluate = evaluate, tablebase = None):
+	return Engine(evaluate, TranspositionTable(1), tablebase).search(board, depth, time_limit, node_limit)
@@ -0,0 +1,292 @@
+import checkers
+
+from checkers.board import Move
+
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import math
+import os
+import random
+import time
+
+# Monte Carlo tree search with UCT selection and random playouts. Moves are packed ints throughout (see checkers.board).
+#
+# The tree lives in flat arrays indexed by node number rather than one object per node. A node's children are stored next
+# to each other, so a node only needs the index of its first child and how many there are. Node 0 is the root.
+#
+# Parallel search is root parallel: every worker process grows its own tree from the same position for its share of the
+# playouts or time and the root statistics are added up at the end, so workers never have to talk to each other.
+
+DEFAULT_EXPLORATION = 1.4
+
+DEFAULT_PLAYOUTS = 1000
+
+# A playout that hasn't finished after this many plies counts as a draw
+MAX_PLAYOUT_PLIES = 150
+
+# How many playouts pass between clock checks
+CHECK_INTERVAL = 16
+
+class Tree:
+	def __init__(self):
+		self.parent = array("i")
+
+		# Packed move leading to the node, 0 for the root
+		self.move = array("Q")
+
+		# First child, -1 until the node is expanded
+		self.first_child = array("i")
+
+		self.child_count = array("i")
+
+		self.visits = array("I")
+
+		# Sum of results for the side that played move, 1 a win, 0.5 a draw
+		self.wins = array("d")
+
+		self.add(-1, 0)
+
+	def add(self, parent, move):
+		self.parent.append(parent)
+
+		self.move.append(move)
+
+		self.first_child.append(-1)
+
+		self.child_count.append(0)
+
+		self.visits.append(0)
+
+		self.wins.append(0.0)
+
+		return len(self.parent) - 1
+
+	def expand(self, node, moves):
+		self.first_child[node] = len(self.parent)
+
+		self.child_count[node] = len(moves)
+
+		for move in moves:
+			self.add(node, move)
+
+	def children(self, node):
+		first = self.first_child[node]
+
+		return range(first, first + self.child_count[node]) if first >= 0 else range(0)
+
+	def __len__(self):
+		return len(self.parent)
+
+class MCTSResult:
+	def __init__(self, move, visits, playouts, seconds, children, nodes):
+		self.move = move
+
+		self.visits = visits
+
+		self.playouts = playouts
+
+		self.seconds = seconds
+
+		# (move, visits, wins) of every root move, most visited first
+		self.children = children
+
+		self.nodes = nodes
+
+	@property
+	def visits_per_second(self):
+		return self.playouts / self.seconds if self.seconds > 0 else 0.0
+
+	def __repr__(self):
+		return f"<MCTSResult {self.move} visits={self.visits} playouts={self.playouts} {self.visits_per_second:.0f} visits/s>"
+
+class MCTS:
+	def __init__(self, exploration = DEFAULT_EXPLORATION, max_playout_plies = MAX_PLAYOUT_PLIES, seed = None):
+		self.exploration = exploration
+
+		self.max_playout_plies = max_playout_plies
+
+		self.random = random.Random(seed)
+
+	def _select(self, tree, node):
+		best = -1
+
+		best_score = -1.0
+
+		log_visits = math.log(tree.visits[node] or 1)
+
+		visits = tree.visits
+
+		wins = tree.wins
+
+		for child in tree.children(node):
+			if not visits[child]:
+				return child
+
+			score = wins[child] / visits[child] + self.exploration * math.sqrt(log_visits / visits[child])
+
+			if score > best_score:
+				best = child
+
+				best_score = score
+
+		return best
+
+	# Random moves to the end of the game, returns the winner or None for a draw. The board is put back afterwards.
+	def _playout(self, board):
+		plies = 0
+
+		winner = None
+
+		while plies < self.max_playout_plies and not board.is_draw():
+			moves = list(board.generate_packed_moves())
+
+			if not moves:
+				winner = not board.turn
+
+				break
+
+			board.push_packed(self.random.choice(moves))
+
+			plies += 1
+
+		for _ in range(plies):
+			board.pop_packed()
+
+		return winner
+
+	# One selection, expansion, playout and backup
+	def _iterate(self, tree, board):
+		node = 0
+
+		depth = 0
+
+		# Side to move at every node on the path
+		turns = [board.turn]
+
+		while tree.first_child[node] >= 0 and tree.child_count[node]:
+			node = self._select(tree, node)
+
+			board.push_packed(tree.move[node])
+
+			turns.append(board.turn)
+
+			depth += 1
+
+		if tree.first_child[node] < 0:
+			moves = list(board.generate_packed_moves())
+
+			tree.expand(node, moves)
+
+			if moves:
+				node = tree.first_child[node] + self.random.randrange(len(moves))
+
+				board.push_packed(tree.move[node])
+
+				turns.append(board.turn)
+
+				depth += 1
+
+		winner = self._playout(board)
+
+		for _ in range(depth):
+			board.pop_packed()
+
+		# Each node is scored for whoever moved into it, the side to move at its parent
+		for i in range(depth, -1, -1):
+			tree.visits[node] += 1
+
+			if i > 0:
+				mover = turns[i - 1]
+
+				tree.wins[node] += 0.5 if winner is None else (1.0 if winner == mover else 0.0)
+
+			node = tree.parent[node]
+
+	# Grows a tree from board (left as it was) until playouts have been run or time_limit seconds have passed
+	def grow(self, board, playouts = None, time_limit = None):
+		if playouts is None and time_limit is None:
+			playouts = DEFAULT_PLAYOUTS
+
+		board = board.copy()
+
+		tree = Tree()
+
+		deadline = time.perf_counter() + time_limit if time_limit else None
+
+		count = 0
+
+		while playouts is None or count < playouts:
+			self._iterate(tree, board)
+
+			count += 1
+
+			if deadline and count % CHECK_INTERVAL == 0 and time.perf_counter() > deadline:
+				break
+
+			# A root with no moves has nothing to search
+			if tree.first_child[0] >= 0 and not tree.child_count[0]:
+				break
+
+		return tree, count
+
+	def search(self, board, playouts = None, time_limit = None):
+		start = time.perf_counter()
+
+		tree, count = self.grow(board, playouts, time_limit)
+
+		return _result([_root_stats(tree)], count, time.perf_counter() - start, len(tree))
+
+def _root_stats(tree):
+	return [(tree.move[child], tree.visits[child], tree.wins[child]) for child in tree.children(0)]
+
+def _result(stats, playouts, seconds, nodes):
+	merged = {}
+
+	for worker in stats:
+		for move, visits, wins in worker:
+			total = merged.setdefault(move, [0, 0.0])
+
+			total[0] += visits
+
+			total[1] += wins
+
+	children = sorted(((move, visits, wins) for move, (visits, wins) in merged.items()), key = lambda child: -child[1])
+
+	if not children:
+		return None
+
+	return MCTSResult(Move.from_packed(children[0][0]), children[0][1], playouts, seconds, children, nodes)
+
+# Runs in a worker process: the root statistics of one tree, how many playouts it ran and its size
+def _grow_worker(position, playouts, time_limit, exploration, max_playout_plies, seed):
+	search = MCTS(exploration, max_playout_plies, seed)
+
+	tree, count = search.grow(checkers.BitBoard.from_snapshot(position), playouts, time_limit)
+
+	return _root_stats(tree), count, len(tree)
+
+# Root parallel search over workers processes, the playout budget is split between them and a time limit applies to each.
+# Returns None when the side to move has no legal moves.
+def search(board, playouts = None, time_limit = None, workers = None, exploration = DEFAULT_EXPLORATION, max_playout_plies = MAX_PLAYOUT_PLIES, seed = None):
+	workers = workers or os.cpu_count() or 1
+
+	if workers == 1:
+		return MCTS(exploration, max_playout_plies, seed).search(board, playouts, time_limit)
+
+	if playouts is None and time_limit is None:
+		playouts = DEFAULT_PLAYOUTS
+
+	start = time.perf_counter()
+
+	position = board.snapshot()
+
+	seeds = random.Random(seed)
+
+	shares = [None] * workers if playouts is None else [playouts // workers + (1 if i < playouts % workers else 0) for i in range(workers)]
+
+	with ProcessPoolExecutor(workers) as executor:
+		futures = [executor.submit(_grow_worker, position, shares[i], time_limit, exploration, max_playout_plies, seeds.getrandbits(64)) for i in range(workers)]
+
+		results = [future.result() for future in futures]
+
+	return _result([stats for stats, _, _ in results], sum(count for _, count, _ in results), time.perf_counter() - start, sum(nodes for _, _, nodes in results))
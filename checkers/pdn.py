@@ -0,0 +1,303 @@
+import checkers
+
+from checkers.board import Move, MultiJump, fen_layout
+from checkers.squares import BIT_SQUARES, SQUARE_BITS
+
+import re
+
+# Portable Draughts Notation. Squares are numbered 1 to 32 from the side of whoever moves first, which PDN calls Black
+# and which is red here, so PDN square n is dark square 32 - n of checkers.squares (the board turned half way round).
+#
+# read_games goes through a file one line at a time and only ever holds the game it is reading, write_game and
+# PDNWriter write games out one at a time, so neither side cares how big the file is.
+
+RESULTS = ("1-0", "0-1", "1/2-1/2", "2-0", "0-2", "1-1", "0-0", "*")
+
+# Order matters, results come before moves so "1-0" isn't read as a move from square 1
+_TOKEN = re.compile(r"\{[^}]*\}?|;[^\n]*|\(|\)|\$\d+|(?:1-0|0-1|1/2-1/2|2-0|0-2|1-1|0-0|\*)(?![\d-])|\d+\.(?:\.\.)?|\d+(?:[-x]\d+)+|\S+")
+
+_HEADER = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+
+_MOVE = re.compile(r"\d+(?:[-x]\d+)+")
+
+_MOVE_NUMBER = re.compile(r"\d+\.(?:\.\.)?")
+
+def square_to_pdn(square):
+	return 32 - SQUARE_BITS[square]
+
+def pdn_to_square(number):
+	if number < 1 or number > 32:
+		raise checkers.InvalidMoveError(f"Invalid PDN square: {number}")
+
+	return BIT_SQUARES[32 - number]
+
+# "11-15" or "15x22" or "15x22x29", every landing square of a capture is written out
+def move_to_pdn(move):
+	if type(move) is MultiJump:
+		return "x".join([str(square_to_pdn(move.from_square))] + [str(square_to_pdn(m.to_square)) for m in move.moves])
+
+	if move.drops:
+		return f"{square_to_pdn(move.from_square)}x{square_to_pdn(move.to_square)}"
+
+	return f"{square_to_pdn(move.from_square)}-{square_to_pdn(move.to_square)}"
+
+# The Move a PDN move stands for. Captures written with only their ends ("15x29") become a plain Move that
+# Board.play_move matches against the legal capture sequences.
+def parse_move(text):
+	if not _MOVE.fullmatch(text):
+		raise checkers.InvalidMoveError(f"Invalid PDN move: {text}")
+
+	squares = [pdn_to_square(int(number)) for number in re.split("[-x]", text)]
+
+	if len(squares) == 2:
+		return Move(squares[0], squares[1])
+
+	return MultiJump([Move(squares[i], squares[i + 1]) for i in range(len(squares) - 1)])
+
+# Board layout and side to move from a PDN FEN tag such as "B:W21,22,K30:B1-12". B is red here, W is black.
+def parse_fen(fen):
+	squares = [checkers.EMPTY] * 64
+
+	fields = fen.strip().rstrip(".").split(":")
+
+	if not fields or fields[0].upper() not in ("B", "W"):
+		raise checkers.InvalidFenError("Invalid PDN FEN: " + fen)
+
+	turn = checkers.RED if fields[0].upper() == "B" else checkers.BLACK
+
+	# Numbers that don't parse or aren't squares
+	try:
+		for field in fields[1:]:
+			if not field:
+				continue
+
+			color = checkers.RED if field[0].upper() == "B" else checkers.BLACK
+
+			for item in field[1:].split(","):
+				item = item.strip()
+
+				if not item:
+					continue
+
+				piece = checkers.PIECE
+
+				if item[0].upper() == "K":
+					piece = checkers.KING
+
+					item = item[1:]
+
+				if "-" in item:
+					first, last = item.split("-")
+
+					numbers = range(int(first), int(last) + 1)
+				else:
+					numbers = [int(item)]
+
+				for number in numbers:
+					squares[pdn_to_square(number)] = piece | color
+	except (ValueError, checkers.InvalidMoveError):
+		raise checkers.InvalidFenError("Invalid PDN FEN: " + fen)
+
+	return fen_layout(squares), turn
+
+def board_to_fen(board):
+	fields = ["B" if board.turn == checkers.RED else "W"]
+
+	for color, name in ((checkers.BLACK, "W"), (checkers.RED, "B")):
+		items = []
+
+		for square in sorted(board.get_player_pieces(color), key = square_to_pdn):
+			items.append(("K" if board.squares[square] & checkers.KING else "") + str(square_to_pdn(square)))
+
+		fields.append(name + ",".join(items))
+
+	return ":".join(fields)
+
+# Tag values are quoted, so quotes and the backslash that escapes them are written with a backslash in front
+def _escape(value):
+	return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+def _unescape(value):
+	return re.sub(r"\\(.)", r"\1", value)
+
+class Game:
+	def __init__(self, headers = None, moves = None, result = "*"):
+		# Tag pairs in file order
+		self.headers = headers if headers is not None else {}
+
+		# Moves as PDN text, "11-15", "22x15" and so on
+		self.moves = moves if moves is not None else []
+
+		self.result = result
+
+	def from_board(board, headers = None, result = None):
+		game = Game(dict(headers or {}))
+
+		start = board_to_fen(board.root())
+
+		# Without a FEN tag a game is read back from the standard start
+		if start != board_to_fen(checkers.Board()):
+			game.headers.setdefault("FEN", start)
+
+		# Packed moves from push_packed sit on the stack as ints
+		for move in board.move_stack:
+			game.moves.append(move_to_pdn(Move.from_packed(move) if type(move) is int else move))
+
+		game.result = result or game.headers.get("Result", "*")
+
+		game.headers.setdefault("Result", game.result)
+
+		return game
+
+	# The position the game starts from, the FEN tag if there is one
+	def board(self, board_class = checkers.Board):
+		if "FEN" not in self.headers:
+			return board_class()
+
+		layout, turn = parse_fen(self.headers["FEN"])
+
+		return board_class(layout + (" r" if turn == checkers.RED else " b"))
+
+	# Plays the game through Board.play_move, yielding the board and the legal move after every move
+	def replay(self, board_class = checkers.Board):
+		board = self.board(board_class)
+
+		for text in self.moves:
+			board.play_move(parse_move(text))
+
+			yield board, board.peek()
+
+	def end(self, board_class = checkers.Board):
+		board = self.board(board_class)
+
+		for text in self.moves:
+			board.play_move(parse_move(text))
+
+		return board
+
+	def __str__(self):
+		lines = [f'[{name} "{_escape(value)}"]' for name, value in self.headers.items()]
+
+		lines.append("")
+
+		lines += _wrap(_movetext(self.moves, self.result, self.headers.get("FEN")))
+
+		return "\n".join(lines) + "\n"
+
+def _movetext(moves, result, fen = None):
+	tokens = []
+
+	# Games set up with the second player to move start at "1..."
+	offset = 1 if fen and fen.strip().upper().startswith("W") else 0
+
+	for i, move in enumerate(moves):
+		ply = i + offset
+
+		# Numbers stay on the same line as their move
+		if ply % 2 == 0:
+			tokens.append(f"{ply // 2 + 1}. {move}")
+		elif i == 0:
+			tokens.append(f"{ply // 2 + 1}... {move}")
+		else:
+			tokens.append(move)
+
+	tokens.append(result)
+
+	return tokens
+
+def _wrap(tokens, width = 79):
+	lines = []
+
+	line = ""
+
+	for token in tokens:
+		if line and len(line) + 1 + len(token) > width:
+			lines.append(line)
+
+			line = token
+		else:
+			line = f"{line} {token}" if line else token
+
+	if line:
+		lines.append(line)
+
+	return lines
+
+def _parse_movetext(text):
+	moves = []
+
+	result = "*"
+
+	depth = 0
+
+	for token in _TOKEN.findall(text):
+		if token == "(":
+			depth += 1
+		elif token == ")":
+			depth = max(0, depth - 1)
+		elif depth or token[0] in "{;$" or _MOVE_NUMBER.fullmatch(token):
+			continue
+		elif token in RESULTS:
+			result = token
+		elif _MOVE.fullmatch(token):
+			moves.append(token)
+
+	return moves, result
+
+# Yields every Game in a PDN file or any iterable of lines, reading no further ahead than the game it is on
+def read_games(file):
+	headers = {}
+
+	movetext = []
+
+	for line in file:
+		stripped = line.strip()
+
+		# A tag after some movetext starts the next game
+		if stripped.startswith("[") and movetext and not _open_comment(movetext):
+			moves, result = _parse_movetext(" ".join(movetext))
+
+			yield Game(headers, moves, result)
+
+			headers = {}
+
+			movetext = []
+
+		if stripped.startswith("[") and not movetext:
+			for name, value in _HEADER.findall(stripped):
+				headers[name] = _unescape(value)
+		elif stripped:
+			movetext.append(stripped)
+
+	if headers or movetext:
+		moves, result = _parse_movetext(" ".join(movetext))
+
+		yield Game(headers, moves, result)
+
+def _open_comment(lines):
+	text = " ".join(lines)
+
+	return text.count("{") > text.count("}")
+
+def write_game(file, game):
+	file.write(str(game))
+
+	file.write("\n")
+
+class PDNWriter:
+	# Writes games to an open text file as they're handed over, so nothing is kept around between them
+	def __init__(self, file):
+		self.file = file
+
+		self.count = 0
+
+	def write(self, game):
+		write_game(self.file, game)
+
+		self.count += 1
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.file.flush()
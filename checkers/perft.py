@@ -0,0 +1,274 @@
+import checkers
+
+import argparse
+import json
+import platform
+import sys
+import time
+import timeit
+
+# Perft counts the leaf nodes of the move tree to a fixed depth, which makes it both a move generation benchmark and a correctness check.
+
+# Published counts for 8x8 checkers (captures forced, jump sequences carried on to the end) from the starting position
+STARTING_COUNTS = {
+	1: 7,
+	2: 49,
+	3: 302,
+	4: 1469,
+	5: 7361,
+	6: 36768,
+	7: 179740,
+	8: 845931,
+	9: 3963680,
+	10: 18391564
+}
+
+# Multi-jumps, branching captures, a king capturing in a full circle, promotions and a kings only ending, all red to move.
+# There are no published counts for these, they were cross checked between Board and BitBoard.
+TACTICAL_POSITIONS = {
+	"branching-jumps": ("--------/--------/---P-P--/--------/-P-P----/--p-----/--------/--------", [3, 14, 22, 89, 164, 714]),
+	"king-cycle": ("-----P-P/--------/-P-P----/--------/-P-P----/--k-----/--------/K-----p-", [2, 8, 38, 122, 614, 2596]),
+	"promotion": ("--------/--P---p-/--------/----P---/---p----/--------/-P------/--------", [1, 4, 12, 45, 165, 671]),
+	"kings-endgame": ("-K------/--------/--------/--------/--------/--------/--------/------k-", [2, 4, 12, 36, 108, 324]),
+	"crowded-middle": ("-P-P-P-P/P-P-P-P-/-P---P-P/--P-----/---p-p--/p-----p-/-p-p-p-p/p-p-p-p-", [9, 24, 92, 435, 1973, 9003])
+}
+
+BACKENDS = {
+	"board": checkers.Board,
+	"bitboard": checkers.BitBoard
+}
+
+# Slower than the baseline by more than this fraction counts as a regression
+DEFAULT_TOLERANCE = 0.15
+
+def perft(board, depth):
+	if depth == 0:
+		return 1
+
+	moves = list(board.generate_legal_moves())
+
+	# Leaves don't need to be played to be counted
+	if depth == 1:
+		return len(moves)
+
+	nodes = 0
+
+	for move in moves:
+		board.push(move)
+
+		nodes += perft(board, depth - 1)
+
+		board.pop()
+
+	return nodes
+
+# Leaf counts below each root move, the usual way of narrowing down which move a generator bug is under
+def divide(board, depth):
+	counts = {}
+
+	for move in list(board.generate_legal_moves()):
+		board.push(move)
+
+		counts[move.uci()] = counts.get(move.uci(), 0) + perft(board, depth - 1)
+
+		board.pop()
+
+	return counts
+
+def timed_perft(board, depth):
+	start = time.perf_counter()
+
+	nodes = perft(board, depth)
+
+	elapsed = time.perf_counter() - start
+
+	return {
+		"nodes": nodes,
+		"seconds": elapsed,
+		"nps": nodes / elapsed if elapsed > 0 else 0.0
+	}
+
+# (name, fen, {depth: expected nodes}) for the starting position and every tactical position
+def positions():
+	cases = [("start", None, STARTING_COUNTS)]
+
+	for name, (fen, counts) in TACTICAL_POSITIONS.items():
+		cases.append((name, fen, { depth + 1: nodes for depth, nodes in enumerate(counts) }))
+
+	return cases
+
+def _board(backend, fen):
+	return backend(fen) if fen else backend()
+
+# Checks every known count up to max_depth, returns a list of "name perft(depth) = nodes, expected n" strings for the ones that don't match
+def verify(backend = checkers.Board, max_depth = 5):
+	failures = []
+
+	for name, fen, counts in positions():
+		board = _board(backend, fen)
+
+		for depth, expected in counts.items():
+			if depth > max_depth:
+				continue
+
+			nodes = perft(board, depth)
+
+			if nodes != expected:
+				failures.append(f"{name} perft({depth}) = {nodes}, expected {expected}")
+
+	return failures
+
+# Times perft on every position, keeping the best of `rounds` runs like pytest-benchmark's min column
+def benchmark(backend = checkers.Board, depth = 5, rounds = 3):
+	results = {}
+
+	for name, fen, counts in positions():
+		board = _board(backend, fen)
+
+		best = None
+
+		for _ in range(rounds):
+			run = timed_perft(board, depth)
+
+			if best is None or run["seconds"] < best["seconds"]:
+				best = run
+
+		best["expected"] = counts.get(depth)
+
+		results[name] = best
+
+	return {
+		"backend": next((key for key, value in BACKENDS.items() if value is backend), backend.__name__),
+		"depth": depth,
+		"python": platform.python_version(),
+		"results": results
+	}
+
+# Microseconds per call of the square and move helpers perft doesn't reach, mostly name lookups and single move checks
+def micro(backend = checkers.Board, number = 20000):
+	board = backend()
+
+	move = next(board.generate_legal_moves())
+
+	uci = move.uci()
+
+	calls = {
+		"index_to_square": lambda: checkers.index_to_square(42),
+		"parse_square": lambda: checkers.parse_square("C3"),
+		"move.uci": move.uci,
+		"parse_uci": lambda: board.parse_uci(uci),
+		"is_legal": lambda: board.is_legal(move),
+		"legal_moves": lambda: list(board.generate_legal_moves())
+	}
+
+	return { name: timeit.timeit(call, number = number) / number * 1e6 for name, call in calls.items() }
+
+# Compares a benchmark run against a saved one, returns a list of regression messages (empty when nothing got slower or wrong)
+def compare(run, baseline, tolerance = DEFAULT_TOLERANCE):
+	regressions = []
+
+	for name, result in run["results"].items():
+		if result["expected"] is not None and result["nodes"] != result["expected"]:
+			regressions.append(f"{name}: {result['nodes']} nodes, expected {result['expected']}")
+
+		if name not in baseline["results"] or run["depth"] != baseline["depth"]:
+			continue
+
+		base = baseline["results"][name]
+
+		if result["nodes"] != base["nodes"]:
+			regressions.append(f"{name}: {result['nodes']} nodes, baseline had {base['nodes']}")
+
+		if result["seconds"] > base["seconds"] * (1 + tolerance):
+			regressions.append(f"{name}: {result['seconds']:.4f}s, baseline {base['seconds']:.4f}s ({result['seconds'] / base['seconds'] - 1:+.1%})")
+
+	return regressions
+
+def main(argv = None):
+	parser = argparse.ArgumentParser(prog = "python -m checkers.perft", description = "Perft move generation counts and benchmarks")
+
+	parser.add_argument("depth", type = int, nargs = "?", default = 5)
+
+	parser.add_argument("--fen", help = "position to search instead of the starting position")
+
+	parser.add_argument("--backend", choices = BACKENDS.keys(), default = "board")
+
+	parser.add_argument("--divide", action = "store_true", help = "print the node count under every root move")
+
+	parser.add_argument("--verify", action = "store_true", help = "check all known counts up to depth")
+
+	parser.add_argument("--bench", action = "store_true", help = "time every known position at depth")
+
+	parser.add_argument("--micro", action = "store_true", help = "time square lookups and single move checks")
+
+	parser.add_argument("--rounds", type = int, default = 3)
+
+	parser.add_argument("--save", metavar = "JSON", help = "write the benchmark results as a new baseline")
+
+	parser.add_argument("--compare", metavar = "JSON", help = "flag regressions against a saved baseline")
+
+	parser.add_argument("--tolerance", type = float, default = DEFAULT_TOLERANCE)
+
+	args = parser.parse_args(argv)
+
+	backend = BACKENDS[args.backend]
+
+	if args.verify:
+		failures = verify(backend, args.depth)
+
+		for failure in failures:
+			print(failure)
+
+		print("ok" if not failures else f"{len(failures)} mismatches")
+
+		return 1 if failures else 0
+
+	if args.micro:
+		for name, micros in micro(backend).items():
+			print(f"{name:16} {micros:>9.3f}us")
+
+		return 0
+
+	if args.bench or args.save or args.compare:
+		run = benchmark(backend, args.depth, args.rounds)
+
+		for name, result in run["results"].items():
+			print(f"{name:16} {result['nodes']:>10} nodes {result['seconds']:>9.4f}s {result['nps']:>12.0f} nodes/s")
+
+		if args.save:
+			with open(args.save, "w") as file:
+				json.dump(run, file, indent = 2)
+
+		if args.compare:
+			with open(args.compare) as file:
+				regressions = compare(run, json.load(file), args.tolerance)
+
+			for regression in regressions:
+				print("REGRESSION", regression)
+
+			return 1 if regressions else 0
+
+		return 0
+
+	board = _board(backend, args.fen)
+
+	if args.divide:
+		total = 0
+
+		for uci, nodes in divide(board, args.depth).items():
+			print(f"{uci}: {nodes}")
+
+			total += nodes
+
+		print(f"\n{total} nodes")
+
+		return 0
+
+	result = timed_perft(board, args.depth)
+
+	print(f"perft({args.depth}) = {result['nodes']} in {result['seconds']:.4f}s ({result['nps']:.0f} nodes/s)")
+
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
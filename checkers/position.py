@@ -0,0 +1,126 @@
+from multiprocessing import shared_memory
+import struct
+
+# Immutable snapshot of a board position, everything Board needs to carry on from it and nothing else: no move stack,
+# no Move objects and no caches. It is one fixed size bytes object laid out as
+#
+#   squares        64 bytes   Board.squares
+#   turn            1 byte    1 for red
+#   red pieces      1 byte
+#   black pieces    1 byte
+#   hash            8 bytes   the board's Zobrist key, so restoring doesn't recompute it
+#
+# so it can be copied, hashed, sent between processes as is and stored side by side in SharedPositions.
+
+POSITION_SIZE = 75
+
+_TAIL = struct.Struct("<BBBQ")
+
+class Position:
+	__slots__ = ("data",)
+
+	def __init__(self, data):
+		if len(data) != POSITION_SIZE:
+			raise ValueError(f"A position is {POSITION_SIZE} bytes, not {len(data)}")
+
+		object.__setattr__(self, "data", bytes(data))
+
+	def from_board(board):
+		return Position(bytes(board.squares) + _TAIL.pack(1 if board.turn else 0, board.red_pieces, board.black_pieces, board._hash))
+
+	def __setattr__(self, name, value):
+		raise AttributeError("Position is immutable")
+
+	@property
+	def squares(self):
+		return self.data[:64]
+
+	@property
+	def turn(self):
+		return self.data[64] == 1
+
+	@property
+	def red_pieces(self):
+		return self.data[65]
+
+	@property
+	def black_pieces(self):
+		return self.data[66]
+
+	@property
+	def zobrist_hash(self):
+		return _TAIL.unpack_from(self.data, 64)[3]
+
+	def __eq__(self, other):
+		return isinstance(other, Position) and self.data == other.data
+
+	def __hash__(self):
+		return hash(self.data)
+
+	def __reduce__(self):
+		return (Position, (self.data,))
+
+	def __repr__(self):
+		return f"<Position {self.zobrist_hash:016x} {'red' if self.turn else 'black'} to move>"
+
+class SharedPositions:
+	# A fixed number of positions in one multiprocessing.shared_memory block. Create it with a count, hand .name (or the
+	# object itself, which pickles as its name) to other processes and open it there with SharedPositions(name = name).
+	# Reads and writes copy the 75 bytes of a position straight in or out, nothing is pickled.
+
+	def __init__(self, count = None, name = None):
+		if name is None:
+			self.memory = shared_memory.SharedMemory(create = True, size = max(1, count) * POSITION_SIZE)
+
+			self.owner = True
+		else:
+			self.memory = shared_memory.SharedMemory(name = name)
+
+			self.owner = False
+
+		self.count = count if count is not None else self.memory.size // POSITION_SIZE
+
+	@property
+	def name(self):
+		return self.memory.name
+
+	def __len__(self):
+		return self.count
+
+	def _offset(self, i):
+		if i < 0:
+			i += self.count
+
+		if not 0 <= i < self.count:
+			raise IndexError("position index out of range")
+
+		return i * POSITION_SIZE
+
+	def __getitem__(self, i):
+		offset = self._offset(i)
+
+		return Position(self.memory.buf[offset:offset + POSITION_SIZE])
+
+	def __setitem__(self, i, position):
+		offset = self._offset(i)
+
+		self.memory.buf[offset:offset + POSITION_SIZE] = position.data
+
+	def __reduce__(self):
+		return (SharedPositions, (self.count, self.name))
+
+	def close(self):
+		self.memory.close()
+
+	# Frees the block, only the creating process should call it once everyone is done
+	def unlink(self):
+		self.memory.unlink()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+		if self.owner:
+			self.unlink()
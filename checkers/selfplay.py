@@ -0,0 +1,331 @@
+import checkers
+
+from checkers import codec
+from checkers.engine import Engine, evaluate
+from checkers.transposition import TranspositionTable
+
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import json
+import math
+import os
+import random
+import struct
+import sys
+
+# Self-play training data. Games are played in shards of games_per_shard games, each shard by one worker process, and every
+# position of every game becomes one fixed size record in the shard's .bin file:
+#
+#   position   13 bytes   checkers.codec key, little-endian
+#   move        8 bytes   packed move played (see checkers.board)
+#   game        4 bytes   game number
+#   ply         2 bytes
+#   outcome     1 byte    signed, 1 if the side that played the move went on to win, 0 a draw, -1 a loss
+#
+# index.json in the same directory describes the run and lists the finished shards with the record offset of each game.
+# Game n is always played from random.Random(f"{seed}:{n}"), so a run is the same whichever worker plays which shard
+# and however often it is stopped and started again. Finished shards are kept and only the missing ones are played.
+
+RECORD = struct.Struct("<13sQIHb")
+
+RECORD_BYTES = RECORD.size
+
+INDEX = "index.json"
+
+DEFAULT_GAMES_PER_SHARD = 100
+
+# A game still going after this many plies is a draw, on top of the board's own repetition and move limit draws
+DEFAULT_MAX_PLIES = 200
+
+# Every policy class has spec(), the (name, options) pair make_policy builds it back from, which is what index.json
+# records to tell whether a directory holds the same run
+
+class RandomPolicy:
+	def __call__(self, board, moves, rng):
+		return rng.choice(moves)
+
+	def spec(self):
+		return ("random", {})
+
+class WeightedPolicy:
+	# Picks moves at random weighted by how the evaluation likes the position they lead to, lower temperature plays stronger
+	def __init__(self, temperature = 50.0):
+		self.temperature = temperature
+
+	def __call__(self, board, moves, rng):
+		scores = []
+
+		for move in moves:
+			board.push_packed(move)
+
+			scores.append(-evaluate(board))
+
+			board.pop_packed()
+
+		best = max(scores)
+
+		return rng.choices(moves, weights = [math.exp((score - best) / self.temperature) for score in scores])[0]
+
+	def spec(self):
+		return ("weighted", { "temperature": self.temperature })
+
+class EnginePolicy:
+	# Engine.search to depth, playing a random move instead with probability noise so games don't all repeat
+	def __init__(self, depth = 2, noise = 0.0):
+		self.depth = depth
+
+		self.noise = noise
+
+		self._engine = None
+
+	def __call__(self, board, moves, rng):
+		if self.noise and rng.random() < self.noise:
+			return rng.choice(moves)
+
+		if self._engine is None:
+			self._engine = Engine(table = TranspositionTable(4))
+
+		return self._engine.search(board, self.depth).move.pack()
+
+	# The engine's table is per game, so results don't depend on which games a worker played before
+	def new_game(self):
+		if self._engine is not None:
+			self._engine.new_game()
+
+	def spec(self):
+		return ("engine", { "depth": self.depth, "noise": self.noise })
+
+	def __getstate__(self):
+		return { "depth": self.depth, "noise": self.noise, "_engine": None }
+
+POLICIES = {
+	"random": RandomPolicy,
+	"weighted": WeightedPolicy,
+	"engine": EnginePolicy
+}
+
+# A policy from a name in POLICIES, a (name, options) pair or anything already callable
+def make_policy(spec):
+	if callable(spec):
+		return spec
+
+	if isinstance(spec, str):
+		return POLICIES[spec]()
+
+	name, options = spec
+
+	return POLICIES[name](**options)
+
+# A description of a policy spec that is the same in every process, as stored in index.json. Names and (name, options)
+# pairs describe themselves, policy objects through spec() and plain functions by their module and name. Anything else,
+# lambdas and bound methods included, can't be recognised again and so can't be used for a run that may be resumed.
+def describe_policy(spec):
+	# Built first so a name, its (name, options) and the object itself with default options all describe the same
+	if not callable(spec):
+		spec = make_policy(spec)
+
+	if hasattr(spec, "spec"):
+		spec = spec.spec()
+
+	elif callable(spec):
+		name = f"{getattr(spec, '__module__', '')}.{getattr(spec, '__qualname__', '')}"
+
+		if not hasattr(spec, "__qualname__") or "<" in name or hasattr(spec, "__self__"):
+			raise ValueError(f"{spec!r} has no stable description, give it a spec() method returning (name, options)")
+
+		return ["function", name]
+
+	name, options = spec
+
+	# Through JSON and back so it compares equal to what a previous run wrote
+	return json.loads(json.dumps([name, options], sort_keys = True))
+
+# Plays game number index and returns its records
+def play_game(index, seed, red_policy, black_policy, max_plies = DEFAULT_MAX_PLIES):
+	rng = random.Random(f"{seed}:{index}")
+
+	board = checkers.BitBoard()
+
+	for policy in (red_policy, black_policy):
+		if hasattr(policy, "new_game"):
+			policy.new_game()
+
+	played = []
+
+	winner = None
+
+	while len(played) < max_plies:
+		if board.is_game_over():
+			winner = board.winner()
+
+			break
+
+		moves = list(board.generate_packed_moves())
+
+		move = (red_policy if board.turn == checkers.RED else black_policy)(board, moves, rng)
+
+		played.append((codec.encode(board), move, board.turn))
+
+		board.push_packed(move)
+
+	records = []
+
+	for ply, (key, move, mover) in enumerate(played):
+		outcome = 0 if winner is None else (1 if winner == mover else -1)
+
+		records.append(RECORD.pack(codec.to_bytes(key), move, index, ply, outcome))
+
+	return records
+
+def shard_name(shard):
+	return f"shard-{shard:05d}.bin"
+
+# Runs in a worker: plays one shard and writes it, returns its index entry
+def _play_shard(directory, shard, first_game, games, seed, red, black, max_plies):
+	red_policy = make_policy(red)
+
+	black_policy = make_policy(black)
+
+	path = os.path.join(directory, shard_name(shard))
+
+	offsets = []
+
+	count = 0
+
+	with open(path + ".tmp", "wb") as file:
+		for index in range(first_game, first_game + games):
+			offsets.append(count)
+
+			records = play_game(index, seed, red_policy, black_policy, max_plies)
+
+			file.write(b"".join(records))
+
+			count += len(records)
+
+	os.replace(path + ".tmp", path)
+
+	return { "shard": shard, "file": shard_name(shard), "first_game": first_game, "games": games, "records": count, "offsets": offsets }
+
+def _read_index(directory):
+	path = os.path.join(directory, INDEX)
+
+	if not os.path.exists(path):
+		return None
+
+	with open(path) as file:
+		return json.load(file)
+
+def _write_index(directory, index):
+	path = os.path.join(directory, INDEX)
+
+	with open(path + ".tmp", "w") as file:
+		json.dump(index, file, indent = 1)
+
+	os.replace(path + ".tmp", path)
+
+# Plays games self-play games into directory, picking up where an earlier run with the same settings stopped.
+# red and black are policy specs for make_policy, they have to be picklable when workers > 1 and describe_policy has
+# to know them so a later run can tell it is the same one.
+def generate(directory, games, seed = 0, red = "random", black = "random", workers = None, games_per_shard = DEFAULT_GAMES_PER_SHARD, max_plies = DEFAULT_MAX_PLIES, log = None):
+	os.makedirs(directory, exist_ok = True)
+
+	settings = { "seed": seed, "games_per_shard": games_per_shard, "max_plies": max_plies, "red": describe_policy(red), "black": describe_policy(black), "record_bytes": RECORD_BYTES }
+
+	index = _read_index(directory)
+
+	if index is not None and index["settings"] != settings:
+		raise ValueError(f"{directory} holds a run with other settings: {index['settings']}")
+
+	if index is None:
+		index = { "settings": settings, "shards": [] }
+
+	# A shard counts as done only if its file is all there
+	done = {}
+
+	for entry in index["shards"]:
+		path = os.path.join(directory, entry["file"])
+
+		if os.path.exists(path) and os.path.getsize(path) == entry["records"] * RECORD_BYTES:
+			done[entry["shard"]] = entry
+
+	tasks = []
+
+	for shard in range((games + games_per_shard - 1) // games_per_shard):
+		first = shard * games_per_shard
+
+		count = min(games_per_shard, games - first)
+
+		if shard in done and done[shard]["games"] == count:
+			continue
+
+		tasks.append((directory, shard, first, count, seed, red, black, max_plies))
+
+	def finish(entry):
+		done[entry["shard"]] = entry
+
+		index["shards"] = [done[shard] for shard in sorted(done)]
+
+		index["games"] = sum(entry["games"] for entry in index["shards"])
+
+		_write_index(directory, index)
+
+		if log:
+			log(f"{entry['file']} games {entry['first_game']}-{entry['first_game'] + entry['games'] - 1} {entry['records']} records")
+
+	workers = workers or os.cpu_count() or 1
+
+	if workers == 1:
+		for task in tasks:
+			finish(_play_shard(*task))
+	else:
+		with ProcessPoolExecutor(workers) as executor:
+			for entry in executor.map(_play_shard, *zip(*tasks)) if tasks else []:
+				finish(entry)
+
+	return index
+
+# (position key, move, game, ply, outcome) for every record of every finished shard, in game order
+def read(directory):
+	index = _read_index(directory)
+
+	if index is None:
+		return
+
+	for entry in index["shards"]:
+		with open(os.path.join(directory, entry["file"]), "rb") as file:
+			while True:
+				data = file.read(RECORD_BYTES * 1024)
+
+				if not data:
+					break
+
+				for position, move, game, ply, outcome in RECORD.iter_unpack(data):
+					yield codec.from_bytes(position), move, game, ply, outcome
+
+def main(argv = None):
+	parser = argparse.ArgumentParser(prog = "python -m checkers.selfplay", description = "Self-play training data in binary shards")
+
+	parser.add_argument("directory")
+
+	parser.add_argument("--games", type = int, default = 1000)
+
+	parser.add_argument("--seed", type = int, default = 0)
+
+	parser.add_argument("--red", choices = POLICIES.keys(), default = "random")
+
+	parser.add_argument("--black", choices = POLICIES.keys(), default = "random")
+
+	parser.add_argument("--workers", type = int, default = None)
+
+	parser.add_argument("--games-per-shard", type = int, default = DEFAULT_GAMES_PER_SHARD)
+
+	parser.add_argument("--max-plies", type = int, default = DEFAULT_MAX_PLIES)
+
+	args = parser.parse_args(argv)
+
+	generate(args.directory, args.games, args.seed, args.red, args.black, args.workers, args.games_per_shard, args.max_plies, print)
+
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,419 @@
+import checkers
+
+from checkers import codec
+from checkers.board import Move
+from checkers.engine import Engine
+from checkers.transposition import TranspositionTable
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+# Game server speaking JSON lines over TCP. Every request is one JSON object on a line and gets exactly one object back,
+# carrying the request's "id" if it had one. Requests are
+#
+#   {"op": "new", "fen": ...}                      start a game, fen is optional           -> game state
+#   {"op": "move", "game": id, "move": "C3D4"}     play a move, validated by play_move     -> game state
+#   {"op": "engine", "game": id, "depth": 4}       let the engine move, "play": false only looks
+#   {"op": "state", "game": id}                    -> game state
+#   {"op": "close", "game": id}                    forget the game
+#   {"op": "stats"}                                request latencies for the whole server
+#
+# A game state is {"game", "fen", "turn", "legal", "over", "winner", "latency"}, latency being that game's request times.
+# Failures come back as {"error": message}.
+#
+# Boards live in this process, engine searches go to a process pool as codec keys so the event loop keeps serving
+# the other games while one is thinking.
+
+DEFAULT_HOST = "127.0.0.1"
+
+DEFAULT_PORT = 7474
+
+DEFAULT_DEPTH = 4
+
+# Latency samples kept for percentiles, per game and for the server
+SAMPLES = 1000
+
+# Longest request line accepted
+LINE_LIMIT = 1 << 16
+
+TABLE_SIZE_MB = 8
+
+_engine = None
+
+# Runs in a pool process, returns the engine's packed move or None. The game's repetition history comes along with the
+# position so the engine knows which moves would repeat, and the table is cleared first so the answer doesn't depend on
+# which games this process searched before.
+def _engine_move(key, history, halfmove_clock, depth, time_limit):
+	global _engine
+
+	if _engine is None:
+		_engine = Engine(table = TranspositionTable(TABLE_SIZE_MB))
+
+	_engine.new_game()
+
+	board = codec.decode(key, checkers.BitBoard)
+
+	board.load_repetition_history(history, halfmove_clock)
+
+	result = _engine.search(board, depth, time_limit)
+
+	return result.move.pack() if result else None
+
+class LatencyStats:
+	def __init__(self, samples = SAMPLES):
+		self.count = 0
+
+		self.total = 0.0
+
+		self.max = 0.0
+
+		self.samples = deque(maxlen = samples)
+
+	def add(self, seconds):
+		self.count += 1
+
+		self.total += seconds
+
+		self.max = max(self.max, seconds)
+
+		self.samples.append(seconds)
+
+	def percentile(self, fraction):
+		if not self.samples:
+			return 0.0
+
+		ordered = sorted(self.samples)
+
+		return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+	# Milliseconds, percentiles are over the last SAMPLES requests
+	def summary(self):
+		return {
+			"count": self.count,
+			"mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+			"p50_ms": self.percentile(0.5) * 1000,
+			"p99_ms": self.percentile(0.99) * 1000,
+			"max_ms": self.max * 1000
+		}
+
+class Game:
+	def __init__(self, id, board):
+		self.id = id
+
+		self.board = board
+
+		# Moves and engine replies of one game are handled one at a time
+		self.lock = asyncio.Lock()
+
+		self.latency = LatencyStats()
+
+	def state(self):
+		moves = [move.uci() for move in self.board.generate_legal_moves()]
+
+		return {
+			"game": self.id,
+			"fen": self.board.fen(),
+			"turn": "red" if self.board.turn == checkers.RED else "black",
+			"legal": moves,
+			"over": self.board.is_game_over(),
+			# The side to move has lost once it can't move, a drawn game has no winner
+			"winner": { checkers.RED: "red", checkers.BLACK: "black", None: None }[self.board.winner()],
+			"latency": self.latency.summary()
+		}
+
+class GameServer:
+	def __init__(self, workers = None, depth = DEFAULT_DEPTH, time_limit = None):
+		self.games = {}
+
+		self.depth = depth
+
+		self.time_limit = time_limit
+
+		self.workers = workers or os.cpu_count() or 1
+
+		self.executor = None
+
+		self.latency = LatencyStats()
+
+		self._next_id = 1
+
+		self._server = None
+
+		# Connection handler tasks, so close() can wait for them
+		self._clients = {}
+
+	async def start(self, host = DEFAULT_HOST, port = DEFAULT_PORT):
+		self.executor = ProcessPoolExecutor(self.workers)
+
+		self._server = await asyncio.start_server(self._client, host, port, limit = LINE_LIMIT)
+
+		return self._server.sockets[0].getsockname()[1]
+
+	async def serve_forever(self):
+		async with self._server:
+			await self._server.serve_forever()
+
+	async def close(self):
+		if self._server is not None:
+			self._server.close()
+
+			await self._server.wait_closed()
+
+		for writer in self._clients.values():
+			writer.close()
+
+		await asyncio.gather(*self._clients, return_exceptions = True)
+
+		if self.executor is not None:
+			self.executor.shutdown(cancel_futures = True)
+
+	async def _client(self, reader, writer):
+		task = asyncio.current_task()
+
+		self._clients[task] = writer
+
+		try:
+			while True:
+				line = await reader.readline()
+
+				if not line:
+					break
+
+				response = await self.handle_line(line)
+
+				writer.write(json.dumps(response).encode() + b"\n")
+
+				await writer.drain()
+		except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+			pass
+		finally:
+			del self._clients[task]
+
+			writer.close()
+
+	async def handle_line(self, line):
+		start = time.perf_counter()
+
+		try:
+			request = json.loads(line)
+		except ValueError:
+			return { "error": "Invalid JSON" }
+
+		if not isinstance(request, dict):
+			return { "error": "Requests must be JSON objects" }
+
+		game = None
+
+		try:
+			game = self.games.get(request.get("game"))
+
+			response = await self.handle(request, game)
+		except (checkers.InvalidMoveError, checkers.IllegalMoveError, checkers.AmbiguousMoveError) as e:
+			response = { "error": str(e) }
+		except Exception as e:
+			response = { "error": f"{type(e).__name__}: {e}" }
+
+		if "id" in request:
+			response["id"] = request["id"]
+
+		seconds = time.perf_counter() - start
+
+		self.latency.add(seconds)
+
+		if game is not None:
+			game.latency.add(seconds)
+
+		return response
+
+	async def handle(self, request, game):
+		op = request.get("op")
+
+		if op == "new":
+			game = Game(self._next_id, checkers.BitBoard(request["fen"]) if request.get("fen") else checkers.BitBoard())
+
+			self._next_id += 1
+
+			self.games[game.id] = game
+
+			return game.state()
+
+		if op == "stats":
+			return {
+				"games": len(self.games),
+				"latency": self.latency.summary()
+			}
+
+		if game is None:
+			return { "error": "Unknown game: " + str(request.get("game")) }
+
+		if op == "state":
+			return game.state()
+
+		if op == "close":
+			del self.games[game.id]
+
+			return { "game": game.id, "closed": True }
+
+		if op == "move":
+			async with game.lock:
+				game.board.play_move(Move.from_uci(str(request.get("move", ""))))
+
+			return game.state()
+
+		if op == "engine":
+			async with game.lock:
+				loop = asyncio.get_running_loop()
+
+				packed = await loop.run_in_executor(self.executor, _engine_move, codec.encode(game.board), game.board.repetition_history(), game.board.halfmove_clock, int(request.get("depth", self.depth)), request.get("time_limit", self.time_limit))
+
+				if packed is None:
+					return game.state()
+
+				move = Move.from_packed(packed)
+
+				if request.get("play", True):
+					game.board.play_move(move)
+
+			state = game.state()
+
+			state["move"] = move.uci()
+
+			return state
+
+		return { "error": "Unknown op: " + str(op) }
+
+async def serve(host = DEFAULT_HOST, port = DEFAULT_PORT, workers = None, depth = DEFAULT_DEPTH):
+	server = GameServer(workers, depth)
+
+	port = await server.start(host, port)
+
+	print(f"Serving on {host}:{port}")
+
+	try:
+		await server.serve_forever()
+	finally:
+		await server.close()
+
+# One client connection playing games of random legal moves, answered by the engine every engine_every plies if set
+async def _load_client(host, port, games, max_plies, engine_every, depth, latency, rng):
+	reader, writer = await asyncio.open_connection(host, port, limit = LINE_LIMIT)
+
+	async def call(request):
+		start = time.perf_counter()
+
+		writer.write(json.dumps(request).encode() + b"\n")
+
+		await writer.drain()
+
+		response = json.loads(await reader.readline())
+
+		latency.add(time.perf_counter() - start)
+
+		return response
+
+	plies = 0
+
+	for _ in range(games):
+		state = await call({ "op": "new" })
+
+		game = state["game"]
+
+		for ply in range(max_plies):
+			if state.get("over") or "error" in state:
+				break
+
+			if engine_every and ply % engine_every == engine_every - 1:
+				state = await call({ "op": "engine", "game": game, "depth": depth })
+			else:
+				state = await call({ "op": "move", "game": game, "move": rng.choice(state["legal"]) })
+
+			plies += 1
+
+		await call({ "op": "close", "game": game })
+
+	writer.close()
+
+	await writer.wait_closed()
+
+	return plies
+
+# Runs clients connections against a server and returns request latencies and throughput
+async def load_test(host = DEFAULT_HOST, port = DEFAULT_PORT, clients = 100, games = 1, max_plies = 100, engine_every = 0, depth = 2, seed = 0):
+	latency = LatencyStats(samples = 100000)
+
+	start = time.perf_counter()
+
+	plies = await asyncio.gather(*[_load_client(host, port, games, max_plies, engine_every, depth, latency, random.Random(seed + i)) for i in range(clients)])
+
+	seconds = time.perf_counter() - start
+
+	summary = latency.summary()
+
+	summary["plies"] = sum(plies)
+
+	summary["seconds"] = seconds
+
+	summary["requests_per_second"] = latency.count / seconds if seconds else 0.0
+
+	return summary
+
+# Starts a server in this process and load tests it, for trying changes out without a second terminal
+async def local_load_test(workers = 1, **options):
+	server = GameServer(workers)
+
+	port = await server.start(DEFAULT_HOST, 0)
+
+	try:
+		return await load_test(DEFAULT_HOST, port, **options)
+	finally:
+		await server.close()
+
+def main(argv = None):
+	parser = argparse.ArgumentParser(prog = "python -m checkers.server", description = "JSON lines checkers game server")
+
+	parser.add_argument("command", choices = ("serve", "load"), nargs = "?", default = "serve")
+
+	parser.add_argument("--host", default = DEFAULT_HOST)
+
+	parser.add_argument("--port", type = int, default = DEFAULT_PORT, help = "for load, 0 starts a server of its own")
+
+	parser.add_argument("--workers", type = int, default = None)
+
+	parser.add_argument("--depth", type = int, default = DEFAULT_DEPTH)
+
+	parser.add_argument("--clients", type = int, default = 100)
+
+	parser.add_argument("--games", type = int, default = 1, help = "games per client")
+
+	parser.add_argument("--plies", type = int, default = 100)
+
+	parser.add_argument("--engine-every", type = int, default = 0, help = "ask the engine for every n-th move")
+
+	args = parser.parse_args(argv)
+
+	if args.command == "serve":
+		asyncio.run(serve(args.host, args.port, args.workers, args.depth))
+
+		return 0
+
+	options = { "clients": args.clients, "games": args.games, "max_plies": args.plies, "engine_every": args.engine_every, "depth": args.depth }
+
+	if args.port == 0:
+		summary = asyncio.run(local_load_test(args.workers or 1, **options))
+	else:
+		summary = asyncio.run(load_test(args.host, args.port, **options))
+
+	for name, value in summary.items():
+		print(f"{name:>20} {value:.3f}" if isinstance(value, float) else f"{name:>20} {value}")
+
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
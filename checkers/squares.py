@@ -0,0 +1,58 @@
+# Lookup tables for board geometry, shared by the rest of the package. Nothing in here imports checkers, so any module can use it.
+
+# Only the 32 dark squares are ever played on, so they fit in one int each for red, black and kings.
+# Bit n is the n-th dark square counting from the top left of Board.squares, four to a row, so bit n is on row n // 4.
+
+BIT_SQUARES = []
+
+SQUARE_BITS = [-1] * 64
+
+for _row in range(8):
+	for _col in range(8):
+		if (_row + _col) % 2 == 1:
+			SQUARE_BITS[_row * 8 + _col] = len(BIT_SQUARES)
+
+			BIT_SQUARES.append(_row * 8 + _col)
+
+# Single bit mask for every index of Board.squares, 0 for the light squares
+SQUARE_MASKS = [1 << bit if bit >= 0 else 0 for bit in SQUARE_BITS]
+
+# Index of every set bit of mask, lowest first
+def bits(mask):
+	while mask:
+		low = mask & -mask
+
+		yield low.bit_length() - 1
+
+		mask ^= low
+
+# "A1" to "H8" for every index, A8 is index 0 and H1 index 63
+SQUARE_NAMES = tuple("ABCDEFGH"[square % 8] + str(8 - square // 8) for square in range(64))
+
+SQUARE_ROWS = tuple(square // 8 for square in range(64))
+
+SQUARE_COLS = tuple(square % 8 for square in range(64))
+
+UP_LEFT = 0
+
+UP_RIGHT = 1
+
+DOWN_LEFT = 2
+
+DOWN_RIGHT = 3
+
+# (row, column) step of each direction, red men move up and black men down
+DIAGONALS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+
+def _walk(square, direction, steps):
+	row = square // 8 + DIAGONALS[direction][0] * steps
+
+	col = square % 8 + DIAGONALS[direction][1] * steps
+
+	return row * 8 + col if 0 <= row < 8 and 0 <= col < 8 else -1
+
+# NEIGHBOR_SQUARES[direction][square] is the index one diagonal step away, JUMP_SQUARES[direction][square] the one a jump
+# lands on, -1 when that is off the board. These are Board.squares indexes, the bit versions are in checkers.bitboard.
+NEIGHBOR_SQUARES = tuple(tuple(_walk(square, direction, 1) for square in range(64)) for direction in range(4))
+
+JUMP_SQUARES = tuple(tuple(_walk(square, direction, 2) for square in range(64)) for direction in range(4))
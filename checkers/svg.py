@@ -1,6 +1,10 @@
 import svgwrite
 import checkers
 
+from checkers.board import Move, MultiJump
+
+from checkers.squares import SQUARE_NAMES, SQUARE_ROWS, SQUARE_COLS
+
 import xml.etree.ElementTree as ET
 
 crown = """<g transform="translate(CX, CY)"><g transform="matrix(SCALE,0,0,-SCALE,0,47.5)" id="g10"><g id="g12"><g clip-path="url(#clipPath16)" id="g14"><g transform="translate(19.9346,11.5146)" id="g20"><path id="path22" style="fill:#f4900c;fill-opacity:1;fill-rule:nonzero;stroke:none" d="m 0,0 c -0.517,-0.781 -1.353,-0.781 -1.869,0 l -4.678,5.071 c -0.516,0.782 -0.516,2.048 0,2.828 l 4.678,9.072 c 0.516,0.78 1.352,0.78 1.869,0 L 4.678,7.899 c 0.516,-0.78 0.516,-2.046 0,-2.828 L 0,0 Z"/></g><g transform="translate(29.4346,9.5146)" id="g24"><path id="path26" style="fill:#f4900c;fill-opacity:1;fill-rule:nonzero;stroke:none" d="m 0,0 c -0.517,-0.781 -1.353,-0.781 -1.869,0 l -4.678,5.071 c -0.516,0.782 -0.516,2.047 0,2.828 l 6.678,9.072 c 0.516,0.78 1.352,0.78 1.869,0 L 4.678,7.899 c 0.516,-0.781 0.516,-2.046 0,-2.828 L 0,0 Z"/></g><g transform="translate(10.4351,9.5146)" id="g28"><path id="path30" style="fill:#f4900c;fill-opacity:1;fill-rule:nonzero;stroke:none" d="m 0,0 c -0.517,-0.781 -1.354,-0.781 -1.871,0 l -4.677,5.071 c -0.516,0.782 -0.516,2.047 0,2.828 l 2.677,9.072 c 0.517,0.78 1.354,0.78 1.871,0 L 4.678,7.899 c 0.516,-0.781 0.516,-2.046 0,-2.828 L 0,0 Z"/></g><g transform="translate(34,26)" id="g32"><path id="path34" style="fill:#ffcc4d;fill-opacity:1;fill-rule:nonzero;stroke:none" d="m 0,0 c -0.45,-0.45 -2.12,-2.124 -4,-4.369 l -4.565,8.854 c -0.517,0.781 -1.353,0.781 -1.87,0 L -15,-4.368 -19.565,4.485 c -0.517,0.781 -1.354,0.781 -1.871,0 L -26,-4.368 c -1.88,2.245 -3.55,3.918 -4,4.368 -1,1 -2.485,0.94 -2,-1 1,-4 1,-7 1,-12 l 0,-2 c 0,-2.209 1.791,-4 4,-4 l 24,0 c 2.209,0 4,1.791 4,4 l 0,2 c 0,5 0,8 1,12 0.484,1.94 -1,2 -2,1"/></g><g transform="translate(22,15)" id="g36"><path id="path38" style="fill:#5c913b;fill-opacity:1;fill-rule:nonzero;stroke:none" d="m 0,0 c 0,-1.657 -1.343,-3 -3,-3 -1.657,0 -3,1.343 -3,3 0,1.657 1.343,3 3,3 1.657,0 3,-1.343 3,-3"/></g><g transform="translate(29,15)" id="g40"><path id="path42" style="fill:#5c913b;fill-opacity:1;fill-rule:nonzero;stroke:none" d="m 0,0 c 0,-1.104 -0.896,-2 -2,-2 -1.104,0 -2,0.896 -2,2 0,1.104 0.896,2 2,2 1.104,0 2,-0.896 2,-2"/></g><g transform="translate(36,15)" id="g44"><path id="path46" style="fill:#5c913b;fill-opacity:1;fill-rule:nonzero;stroke:none" d="m 0,0 c 0,-1.104 -0.896,-2 -2,-2 -1.104,0 -2,0.896 -2,2 0,1.104 0.896,2 2,2 1.104,0 2,-0.896 2,-2"/></g><g transform="translate(13,15)" id="g48"><path id="path50" style="fill:#5c913b;fill-opacity:1;fill-rule:nonzero;stroke:none" d="m 0,0 c 0,-1.104 -0.895,-2 -2,-2 -1.104,0 -2,0.896 -2,2 0,1.104 0.896,2 2,2 1.105,0 2,-0.896 2,-2"/></g><g transform="translate(6,15)" id="g52"><path id="path54" style="fill:#5c913b;fill-opacity:1;fill-rule:nonzero;stroke:none" d="m 0,0 c 0,-1.104 -0.895,-2 -2,-2 -1.104,0 -2,0.896 -2,2 0,1.104 0.896,2 2,2 1.105,0 2,-0.896 2,-2"/></g><g transform="translate(35,11)" id="g56"><path id="path58" style="fill:#ffac33;fill-opacity:1;fill-rule:nonzero;stroke:none" d="m 0,0 c 0,-2.209 -1.791,-4 -4,-4 l -24,0 c -2.209,0 -4,1.791 -4,4 L 0,0 Z"/></g></g></g></g></g>"""
@@ -57,57 +61,254 @@ def piece(piece, img = svgwrite.Drawing(size = (64, 64)), size = 64 * 1.5, cente
 	
 	return g
 	
+# Square geometry of every picture, the board is 8 squares of SQUARE_SIZE inside a MARGIN wide frame
+SQUARE_SIZE = 64
+
+MARGIN = 16
+
+SIZE = SQUARE_SIZE * 8 + MARGIN * 2
+
+_FILES = "abcdefgh"
+
+# "a1" to "h8" by index into Board.squares, used for element ids
+_NAMES = [name.lower() for name in SQUARE_NAMES]
+
+class Renderer:
+	# Draws boards the way board() always has, but builds everything that doesn't depend on the position once: the margins,
+	# squares and coordinates, and a <defs> block holding each kind of piece and a single crown. A frame is then that cached
+	# text plus one <use> per piece and the last move highlight, and diff() gives only the elements that changed.
+	#
+	# Pieces have the id "piece-<square>" (e.g. "piece-c3") and the highlight is the group with id "lastmove".
+
+	def __init__(self, colors = COLORS):
+		self.colors = colors
+
+		self._piece_ids = {
+			checkers.PIECE | checkers.RED: "red-man",
+			checkers.KING | checkers.RED: "red-king",
+			checkers.PIECE | checkers.BLACK: "black-man",
+			checkers.KING | checkers.BLACK: "black-king"
+		}
+
+		# Element text per (square, piece), there are only 32 * 4 of them
+		self._elements = {}
+
+		self.defs = self._build_defs()
+
+		self.background = self._build_background()
+
+		# Opening <svg> tag of every drawing
+		self.head = f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" baseProfile="full" version="1.1" width="{SIZE}" height="{SIZE}">'
+
+	def _build_defs(self):
+		radius = SQUARE_SIZE * 1.5 / 4
+
+		inner = SQUARE_SIZE * 1.5 / 4.5
+
+		parts = ["<defs>", "<style type=\"text/css\">@import url('https://fonts.googleapis.com/css?family=Lato|Open+Sans|Oswald|Raleway|Roboto|Indie+Flower|Gamja+Flower');</style>"]
+
+		parts.append('<g id="crown">' + crown.replace("SCALE", str(0.8)).replace("CX", str(-18 * 0.8)).replace("CY", str(-40 * 0.8)) + "</g>")
+
+		for color, name in ((checkers.RED, "red"), (checkers.BLACK, "black")):
+			parts.append(f'<g id="{name}-man"><circle r="{radius}" fill="{self.colors[name + "_border"]}"/><circle r="{inner}" fill="{self.colors[name]}"/></g>')
+
+			parts.append(f'<g id="{name}-king"><use xlink:href="#{name}-man"/><use xlink:href="#crown"/></g>')
+
+		parts.append("</defs>")
+
+		return "".join(parts)
+
+	def _build_background(self):
+		parts = [f'<rect x="0" y="0" width="{SIZE}" height="{SIZE}" fill="{self.colors["margin"]}"/>']
+
+		for row in range(8):
+			for col in range(8):
+				# Same colouring as ever, a1 is a dark square
+				fill = self.colors["light_square"] if (row + col) % 2 == 0 else self.colors["dark_square"]
+
+				parts.append(f'<rect x="{col * SQUARE_SIZE + MARGIN}" y="{row * SQUARE_SIZE + MARGIN}" width="{SQUARE_SIZE}" height="{SQUARE_SIZE}" fill="{fill}"/>')
+
+		for i in range(8):
+			rank = str(8 - i)
+
+			parts.append(f'<text x="5" y="{50 + SQUARE_SIZE * i}" fill="{self.colors["margin_text"]}">{rank}</text>')
+
+			parts.append(f'<text x="{MARGIN + SQUARE_SIZE * 8 + 5}" y="{50 + SQUARE_SIZE * i}" fill="{self.colors["margin_text"]}">{rank}</text>')
+
+			parts.append(f'<text x="{46 + SQUARE_SIZE * i}" y="12" fill="{self.colors["margin_text"]}">{_FILES[i]}</text>')
+
+			parts.append(f'<text x="{46 + SQUARE_SIZE * i}" y="{MARGIN + SQUARE_SIZE * 8 + 12}" fill="{self.colors["margin_text"]}">{_FILES[i]}</text>')
+
+		return "".join(parts)
+
+	def piece_element(self, square, piece):
+		key = (square, piece)
+
+		element = self._elements.get(key)
+
+		if element is None:
+			element = f'<use id="piece-{_NAMES[square]}" xlink:href="#{self._piece_ids[piece]}" x="{SQUARE_COLS[square] * SQUARE_SIZE + MARGIN + SQUARE_SIZE // 2}" y="{SQUARE_ROWS[square] * SQUARE_SIZE + MARGIN + SQUARE_SIZE // 2}"/>'
+
+			self._elements[key] = element
+
+		return element
+
+	# Id in defs of the drawing for a piece value
+	def piece_id(self, piece):
+		return self._piece_ids[piece]
+
+	# The highlighted squares of a move as bare <rect>s, lastmove_element wraps them in the "lastmove" group
+	def lastmove_rects(self, lastmove):
+		parts = []
+
+		for square in sorted(_move_squares(lastmove)):
+			fill = self.colors["light_square_lastmove"] if (SQUARE_ROWS[square] + SQUARE_COLS[square]) % 2 == 0 else self.colors["dark_square_lastmove"]
+
+			parts.append(f'<rect x="{SQUARE_COLS[square] * SQUARE_SIZE + MARGIN}" y="{SQUARE_ROWS[square] * SQUARE_SIZE + MARGIN}" width="{SQUARE_SIZE}" height="{SQUARE_SIZE}" fill="{fill}"/>')
+
+		return "".join(parts)
+
+	def lastmove_element(self, lastmove):
+		return '<g id="lastmove">' + self.lastmove_rects(lastmove) + "</g>"
+
+	def frame(self, board, lastmove = None):
+		parts = [self.head, self.defs, self.background, self.lastmove_element(lastmove), '<g id="pieces">']
+
+		squares = board.squares
+
+		for square in range(64):
+			if squares[square] != checkers.EMPTY:
+				parts.append(self.piece_element(square, squares[square]))
+
+		parts.append("</g></svg>")
+
+		return "".join(parts)
+
+	# The changes from the frame of before to the frame of after as (element id, new element text or None when it's gone)
+	def diff(self, before, after, lastmove = None, previous_lastmove = None):
+		changes = []
+
+		old = before.squares
+
+		new = after.squares
+
+		for square in range(64):
+			if old[square] != new[square]:
+				changes.append(("piece-" + _NAMES[square], self.piece_element(square, new[square]) if new[square] != checkers.EMPTY else None))
+
+		if _move_squares(lastmove) != _move_squares(previous_lastmove):
+			changes.append(("lastmove", self.lastmove_element(lastmove)))
+
+		return changes
+
+def _move_squares(move):
+	if move is None:
+		return set()
+
+	if type(move) is MultiJump:
+		return { square for m in move.moves for square in (m.from_square, m.to_square) }
+
+	return { move.from_square, move.to_square }
+
+_renderer = None
+
 def board(board, lastmove = None):
-	img = svgwrite.Drawing("", size=(64 * 8 + 32, 64 * 8 + 32), profile='full')
+	global _renderer
 
-	light = False
+	if _renderer is None:
+		_renderer = Renderer()
 
-	img.add(Wrapper("""
-	    <defs>
-    <style type="text/css">@import url('https://fonts.googleapis.com/css?family=Lato|Open+Sans|Oswald|Raleway|Roboto|Indie+Flower|Gamja+Flower');</style>
-</defs>
-	"""))
+	return _renderer.frame(board, lastmove)
 
-	img.add(img.rect(insert = (0, 0), size = (64 * 8 + 32, 64 * 8 + 32), fill = COLORS["margin"]))
+def _center(square):
+	return SQUARE_COLS[square] * SQUARE_SIZE + MARGIN + SQUARE_SIZE // 2, SQUARE_ROWS[square] * SQUARE_SIZE + MARGIN + SQUARE_SIZE // 2
 
-	rows = "ABCDEFGH"
+# A whole game as one animated (SMIL) SVG. board_or_moves is a Board whose move stack is played back from the position before
+# its first move, or moves (Move objects, uci strings or packed ints) played from start, a Board or fen that defaults to the
+# starting position. Every piece is drawn once with <use> and only gets an animation for each move it takes part in,
+# so the output grows with the moves played. Each ply takes step seconds, of which move_time is spent sliding.
+def game(board_or_moves, start = None, step = 1.0, move_time = 0.5, renderer = None):
+	renderer = renderer or _renderer or Renderer()
 
-	coords_y = False
+	if hasattr(board_or_moves, "move_stack"):
+		moves = list(board_or_moves.move_stack)
 
-	for x in range(8):
-		for y in range(8):
-			flip = [*reversed([0,1,2,3,4,5,6,7])]
-		
-			cy = flip.index(y)
+		start = board_or_moves.root().fen()
+	else:
+		moves = list(board_or_moves)
 
-			if not coords_y:
-				img.add(img.text(str(cy + 1), insert = (5, 50 + 64 * y), fill = COLORS["margin_text"]))
-	
-				img.add(img.text(str(cy + 1), insert = (16 + 64 * 8 + 5, 50 + 64 * y), fill = COLORS["margin_text"]))
+	if start is None:
+		board = checkers.Board()
+	elif isinstance(start, str):
+		board = checkers.Board(start)
+	else:
+		board = checkers.Board(start.fen())
 
-			if y == 7:
-				coords_y = True
+	# Piece number on each square, and for every piece the square it starts on, whether it starts as a king and its animations
+	pieces = {}
 
-			color = COLORS["light_square"] if light else COLORS["dark_square"]
+	# Pieces that have been crowned during the game and already have their crown
+	crowned = set()
 
-			if lastmove and lastmove.contains(checkers.SQUARES[rows[x] + str(y + 1)]):
-				color = COLORS["light_square_lastmove"] if light else COLORS["dark_square_lastmove"]
-			
-			img.add(img.rect(insert = (x * 64 + 16, cy * 64 + 16), size = (64, 64), fill = color))
+	squares = {}
 
-			if board.squares[checkers.SQUARES[rows[x] + str(y + 1)]] != checkers.EMPTY:
-				square = board.squares[checkers.SQUARES[rows[x] + str(y + 1)]]
-			
-				piece = checkers.svg.piece(checkers.Piece(square & checkers.KING, square & checkers.RED), img, center = (x * 64 + 32 + 16, cy * 64 + 32 + 16))
+	for square in range(64):
+		if board.squares[square] != checkers.EMPTY:
+			squares[square] = len(pieces)
 
-				img.add(piece)
+			pieces[len(pieces)] = (square, board.squares[square], [])
 
-			light = not light
+	highlights = []
 
-		img.add(img.text(rows[x].lower(), insert = (46 + 64 * x, 12), fill = COLORS["margin_text"], style = "font-family: m nw2ddd"))
+	for ply, move in enumerate(moves):
+		if type(move) is int:
+			move = Move.from_packed(move)
 
-		img.add(img.text(rows[x].lower(), insert = (46 + 64 * x, 16 + 64 * 8 + 12), fill = COLORS["margin_text"]))
+		# play_move fills in what a move captured, so it gets a fresh Move rather than the caller's
+		board.play_move(Move.from_uci(move if isinstance(move, str) else move.uci()))
 
-		light = not light
-	
-	return ET.tostring(img.get_xml()).decode()
\ No newline at end of file
+		legal = board.peek()
+
+		jumps = legal.moves if type(legal) is MultiJump else [legal]
+
+		path = [jumps[0].from_square] + [m.to_square for m in jumps]
+
+		begin = ply * step
+
+		number = squares.pop(path[0])
+
+		animations = pieces[number][2]
+
+		points = ";".join("%d %d" % _center(square) for square in path)
+
+		animations.append(f'<animateTransform attributeName="transform" type="translate" values="{points}" begin="{begin}s" dur="{move_time}s" fill="freeze"/>')
+
+		# Crowned, the crown fades in once the piece arrives
+		if board.squares[path[-1]] & checkers.KING and not pieces[number][1] & checkers.KING and number not in crowned:
+			crowned.add(number)
+
+			animations.append(f'<use xlink:href="#crown" visibility="hidden"><set attributeName="visibility" to="visible" begin="{begin + move_time}s" fill="freeze"/></use>')
+
+		squares[path[-1]] = number
+
+		for m in jumps:
+			for captured in m.drops or []:
+				pieces[squares.pop(captured)][2].append(f'<set attributeName="visibility" to="hidden" begin="{begin + move_time}s" fill="freeze"/>')
+
+		# Each highlight shows for its own ply, the last one stays
+		timing = f'begin="{begin}s" fill="freeze"' if ply == len(moves) - 1 else f'begin="{begin}s" dur="{step}s"'
+
+		highlights.append(f'<g visibility="hidden"><set attributeName="visibility" to="visible" {timing}/>' + renderer.lastmove_rects(legal) + "</g>")
+
+	parts = [renderer.head, renderer.defs, renderer.background]
+
+	parts += highlights
+
+	for number, (square, piece, animations) in pieces.items():
+		x, y = _center(square)
+
+		parts.append(f'<g transform="translate({x} {y})"><use xlink:href="#{renderer.piece_id(piece)}"/>' + "".join(animations) + "</g>")
+
+	parts.append("</svg>")
+
+	return "".join(parts)
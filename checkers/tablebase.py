@@ -0,0 +1,435 @@
+import checkers
+
+from checkers import codec
+from checkers.bitboard import ALL_SQUARES, TOP_ROW, BOTTOM_ROW, jumpers, capture_paths, simple_moves, directions_for
+from checkers.squares import bits
+
+from array import array
+from itertools import combinations
+import argparse
+import mmap
+import os
+import sys
+import time
+
+# Endgame tablebases worked out backwards from the lost positions, one file per material signature. A signature is
+# (red men, red kings, black men, black kings) and its file, e.g. "1101.cdb", is one byte for every index:
+#
+#   0      not a position, two groups share a square
+#   1      draw, neither side can force a win
+#   2 + n  the game ends n plies from here, a win for the side to move when n is odd and a loss when it is even
+#
+# An index is the combinatorial rank of every group's squares, red men first, then red kings, black men and black kings,
+# times two plus 1 for black to move. Men never stand on the row they crown on, so those groups rank over 28 squares.
+#
+# Files are opened with mmap, so a probe is a few table lookups and one byte read, and every process probing the same
+# directory shares the pages the OS has cached. Tables assume the default rules, forced captures that go to the end.
+
+DEFAULT_MAX_PIECES = 4
+
+EXTENSION = ".cdb"
+
+# Results of a probe, for the side to move
+WIN = 1
+
+DRAW = 0
+
+LOSS = -1
+
+_NONE = 0
+
+_DRAW = 1
+
+# Longest distance a byte can hold
+MAX_PLIES = 253
+
+# Lowest bit each group's squares start from and how many it can use
+_RED_MEN = (4, 28)
+
+_KINGS = (0, 32)
+
+_BLACK_MEN = (0, 28)
+
+_BINOMIAL = [[0] * 33 for _ in range(33)]
+
+for _n in range(33):
+	_BINOMIAL[_n][0] = 1
+
+	for _k in range(1, _n + 1):
+		_BINOMIAL[_n][_k] = _BINOMIAL[_n - 1][_k - 1] + _BINOMIAL[_n - 1][_k]
+
+def _popcount(mask):
+	return bin(mask).count("1")
+
+def signature(red, black, kings):
+	return (_popcount(red & ~kings), _popcount(red & kings), _popcount(black & ~kings), _popcount(black & kings))
+
+def name(key):
+	return "".join(str(count) for count in key) + EXTENSION
+
+# Every signature with both sides on the board and at most max_pieces pieces, in the order they have to be built:
+# a capture leads to fewer pieces and a crowning to fewer men, so both are always built first
+def signatures(max_pieces = DEFAULT_MAX_PIECES):
+	result = []
+
+	for total in range(2, max_pieces + 1):
+		for red in range(1, total):
+			for red_men in range(red + 1):
+				for black_men in range(total - red + 1):
+					result.append((red_men, red - red_men, black_men, total - red - black_men))
+
+	return sorted(result, key = lambda s: (sum(s), s[0] + s[2]))
+
+def _sizes(key):
+	red_men, red_kings, black_men, black_kings = key
+
+	return (_BINOMIAL[_RED_MEN[1]][red_men], _BINOMIAL[_KINGS[1]][red_kings], _BINOMIAL[_BLACK_MEN[1]][black_men], _BINOMIAL[_KINGS[1]][black_kings])
+
+def size(key):
+	red_men, red_kings, black_men, black_kings = _sizes(key)
+
+	return red_men * red_kings * black_men * black_kings * 2
+
+def _rank(mask, offset):
+	rank = 0
+
+	count = 1
+
+	while mask:
+		low = mask & -mask
+
+		rank += _BINOMIAL[low.bit_length() - 1 - offset][count]
+
+		mask ^= low
+
+		count += 1
+
+	return rank
+
+def index(key, red, black, kings, turn):
+	sizes = _sizes(key)
+
+	i = _rank(red & ~kings, _RED_MEN[0])
+
+	i = i * sizes[1] + _rank(red & kings, 0)
+
+	i = i * sizes[2] + _rank(black & ~kings, 0)
+
+	i = i * sizes[3] + _rank(black & kings, 0)
+
+	return i * 2 + (0 if turn == checkers.RED else 1)
+
+# (red, black, kings) of every position after a move by color, who owns `own`. Crowning ends the move.
+def _children(own, opponent, kings, color):
+	empty = ALL_SQUARES & ~(own | opponent)
+
+	far = TOP_ROW if color == checkers.RED else BOTTOM_ROW
+
+	children = set()
+
+	for start in bits(jumpers(own, opponent, kings, empty, color)):
+		king = kings & (1 << start)
+
+		for path in capture_paths(start, directions_for(color, king), opponent, empty | (1 << start)):
+			captured = 0
+
+			for frm, to, over in path:
+				captured |= 1 << over
+
+			children.add(_apply(own, opponent, kings, start, path[-1][1], captured, king, far, color))
+
+	if children:
+		return children
+
+	for frm, to in simple_moves(own, kings, empty, color):
+		children.add(_apply(own, opponent, kings, frm, to, 0, kings & (1 << frm), far, color))
+
+	return children
+
+def _apply(own, opponent, kings, start, to, captured, king, far, color):
+	moved = 1 << to
+
+	own = (own & ~(1 << start)) | moved
+
+	opponent &= ~captured
+
+	kings &= ~((1 << start) | captured)
+
+	if king or moved & far:
+		kings |= moved
+
+	return (own, opponent, kings) if color == checkers.RED else (opponent, own, kings)
+
+def _positions(key):
+	red_men, red_kings, black_men, black_kings = key
+
+	for a in combinations(range(_RED_MEN[0], 32), red_men):
+		red_man_mask = sum(1 << bit for bit in a)
+
+		for b in combinations(range(32), red_kings):
+			red_king_mask = sum(1 << bit for bit in b)
+
+			if red_man_mask & red_king_mask:
+				continue
+
+			red = red_man_mask | red_king_mask
+
+			for c in combinations(range(28), black_men):
+				black_man_mask = sum(1 << bit for bit in c)
+
+				if red & black_man_mask:
+					continue
+
+				for d in combinations(range(32), black_kings):
+					black_king_mask = sum(1 << bit for bit in d)
+
+					if (red | black_man_mask) & black_king_mask:
+						continue
+
+					yield red, black_man_mask | black_king_mask, red_king_mask | black_king_mask
+
+class Tablebase:
+	# Probes whatever tables are in directory. Files are mapped the first time a signature is asked for.
+	def __init__(self, directory):
+		self.directory = directory
+
+		self._tables = {}
+
+		self.max_pieces = 0
+
+		if os.path.isdir(directory):
+			for filename in os.listdir(directory):
+				if filename.endswith(EXTENSION) and filename[:-len(EXTENSION)].isdigit():
+					self.max_pieces = max(self.max_pieces, sum(int(count) for count in filename[:-len(EXTENSION)]))
+
+	def _table(self, key):
+		table = self._tables.get(key, False)
+
+		if table is not False:
+			return table
+
+		path = os.path.join(self.directory, name(key))
+
+		table = None
+
+		if os.path.exists(path):
+			with open(path, "rb") as file:
+				table = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+
+		self._tables[key] = table
+
+		return table
+
+	# (result, plies) for the side to move, or None when the position isn't covered
+	def probe_masks(self, red, black, kings, turn):
+		own = red if turn == checkers.RED else black
+
+		if not own:
+			return LOSS, 0
+
+		# Already over on the opponent's move
+		if not (black if turn == checkers.RED else red):
+			return None
+
+		key = signature(red, black, kings)
+
+		table = self._table(key)
+
+		if table is None:
+			return None
+
+		value = table[index(key, red, black, kings, turn)]
+
+		if value == _DRAW:
+			return DRAW, 0
+
+		if value == _NONE:
+			return None
+
+		plies = value - 2
+
+		return (WIN if plies % 2 else LOSS), plies
+
+	def probe(self, board):
+		if board.red_pieces + board.black_pieces > self.max_pieces:
+			return None
+
+		red, black, kings = codec.masks(board)
+
+		return self.probe_masks(red, black, kings, board.turn)
+
+	def close(self):
+		for table in self._tables.values():
+			if table is not None:
+				table.close()
+
+		self._tables = {}
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+# Builds the table of one signature from the already built tables of the signatures its moves lead to
+def build(key, tablebase):
+	total = size(key)
+
+	values = bytearray(total)
+
+	# Children that aren't wins for the opponent yet, and 1 + the longest win among those that are
+	remaining = bytearray(total)
+
+	loss_at = bytearray(total)
+
+	# Moves inside the key as (child, parent) pairs, turned into parents per child below
+	edge_children = array("I")
+
+	edge_parents = array("I")
+
+	buckets = [[] for _ in range(MAX_PLIES + 1)]
+
+	def schedule(i, plies):
+		if plies > MAX_PLIES:
+			raise ValueError(f"{name(key)} needs more than {MAX_PLIES} plies")
+
+		buckets[plies].append(i)
+
+	valid = bytearray(total)
+
+	for red, black, kings in _positions(key):
+		for turn in (checkers.RED, checkers.BLACK):
+			i = index(key, red, black, kings, turn)
+
+			valid[i] = 1
+
+			own, opponent = (red, black) if turn == checkers.RED else (black, red)
+
+			count = 0
+
+			longest = -1
+
+			for child in _children(own, opponent, kings, turn):
+				if key == signature(*child):
+					edge_children.append(index(key, child[0], child[1], child[2], not turn))
+
+					edge_parents.append(i)
+
+					count += 1
+
+					continue
+
+				result = tablebase.probe_masks(child[0], child[1], child[2], not turn)
+
+				if result is None:
+					raise ValueError(f"{name(key)} needs a table that hasn't been built")
+
+				result, plies = result
+
+				if result == WIN:
+					longest = max(longest, plies)
+				else:
+					count += 1
+
+					if result == LOSS:
+						schedule(i, plies + 1)
+
+			remaining[i] = count
+
+			loss_at[i] = longest + 1
+
+			if count == 0:
+				schedule(i, longest + 1)
+
+	# Compressed lists of the parents of every position
+	starts = array("I", bytes(4 * (total + 1)))
+
+	for child in edge_children:
+		starts[child + 1] += 1
+
+	for i in range(total):
+		starts[i + 1] += starts[i]
+
+	parents = array("I", bytes(4 * len(edge_parents)))
+
+	filled = array("I", starts)
+
+	for child, parent in zip(edge_children, edge_parents):
+		parents[filled[child]] = parent
+
+		filled[child] += 1
+
+	del edge_children, edge_parents, filled
+
+	for plies in range(MAX_PLIES + 1):
+		bucket = buckets[plies]
+
+		while bucket:
+			i = bucket.pop()
+
+			if values[i]:
+				continue
+
+			values[i] = plies + 2
+
+			for parent in parents[starts[i]:starts[i + 1]]:
+				if values[parent]:
+					continue
+
+				# A loss here is a win one ply earlier for whoever moved into it
+				if plies % 2 == 0:
+					schedule(parent, plies + 1)
+
+					continue
+
+				remaining[parent] -= 1
+
+				loss_at[parent] = max(loss_at[parent], plies + 1)
+
+				if remaining[parent] == 0:
+					schedule(parent, loss_at[parent])
+
+	for i in range(total):
+		if valid[i] and not values[i]:
+			values[i] = _DRAW
+
+	return values
+
+# Builds every missing table up to max_pieces in directory, written under a temporary name first so readers never see half a file
+def generate(directory, max_pieces = DEFAULT_MAX_PIECES, log = None):
+	os.makedirs(directory, exist_ok = True)
+
+	for key in signatures(max_pieces):
+		path = os.path.join(directory, name(key))
+
+		if os.path.exists(path):
+			continue
+
+		start = time.perf_counter()
+
+		with Tablebase(directory) as tablebase:
+			values = build(key, tablebase)
+
+		with open(path + ".tmp", "wb") as file:
+			file.write(values)
+
+		os.replace(path + ".tmp", path)
+
+		if log:
+			log(f"{name(key)} {len(values)} positions {time.perf_counter() - start:.1f}s")
+
+def main(argv = None):
+	parser = argparse.ArgumentParser(prog = "python -m checkers.tablebase", description = "Endgame tablebase generation")
+
+	parser.add_argument("directory")
+
+	parser.add_argument("--pieces", type = int, default = DEFAULT_MAX_PIECES, help = "largest number of pieces on the board")
+
+	args = parser.parse_args(argv)
+
+	generate(args.directory, args.pieces, print)
+
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,128 @@
+from array import array
+
+# Fixed size hash table of search results, stored in two flat arrays of 64-bit ints so entries cost no Python objects.
+#
+# Every bucket has two slots. The first only gets replaced by a search at least as deep, or by anything once it is left
+# over from an earlier search, the second always takes the newest entry. A slot is a key word holding the full Zobrist key
+# and a data word packing, from the low bits up:
+#
+#   move        12 bits   from square | to square << 6, the low bits of a packed move, 0 for none
+#   bound        2 bits   EXACT, LOWER or UPPER
+#   depth        8 bits   stored + 1 so an empty slot is all zeros
+#   generation   8 bits   which search() wrote it
+#   score       22 bits   offset by SCORE_OFFSET to stay positive
+
+EXACT = 0
+
+LOWER = 1
+
+UPPER = 2
+
+SCORE_OFFSET = 1 << 21
+
+ENTRY_BYTES = 16
+
+SLOTS = 2
+
+DEFAULT_SIZE_MB = 16
+
+MOVE_MASK = 0xFFF
+
+class TranspositionTable:
+	def __init__(self, size_mb = DEFAULT_SIZE_MB):
+		# Power of two bucket count so the index is a mask of the key
+		buckets = max(1, int(size_mb * 1024 * 1024) // (ENTRY_BYTES * SLOTS))
+
+		self.buckets = 1 << (buckets.bit_length() - 1)
+
+		self.mask = self.buckets - 1
+
+		self.keys = array("Q", bytes(8 * SLOTS * self.buckets))
+
+		self.data = array("Q", bytes(8 * SLOTS * self.buckets))
+
+		self.generation = 0
+
+		self.hits = 0
+
+		self.misses = 0
+
+		# Probes that found the bucket in use by other positions
+		self.collisions = 0
+
+	@property
+	def size_mb(self):
+		return self.buckets * SLOTS * ENTRY_BYTES / (1024 * 1024)
+
+	def clear(self):
+		self.keys = array("Q", bytes(8 * SLOTS * self.buckets))
+
+		self.data = array("Q", bytes(8 * SLOTS * self.buckets))
+
+		self.generation = 0
+
+		self.hits = 0
+
+		self.misses = 0
+
+		self.collisions = 0
+
+	# Call between searches of the same game, entries from older searches become first to be replaced
+	def new_search(self):
+		self.generation = (self.generation + 1) & 0xFF
+
+	# (depth, bound, score, move) stored for key, or None
+	def probe(self, key):
+		index = (key & self.mask) * SLOTS
+
+		for slot in range(index, index + SLOTS):
+			if self.keys[slot] == key and self.data[slot]:
+				self.hits += 1
+
+				data = self.data[slot]
+
+				return ((data >> 14) & 0xFF) - 1, (data >> 12) & 0x3, (data >> 30) - SCORE_OFFSET, data & 0xFFF
+
+		self.misses += 1
+
+		if self.data[index] or self.data[index + 1]:
+			self.collisions += 1
+
+		return None
+
+	def store(self, key, depth, bound, score, move = 0):
+		index = (key & self.mask) * SLOTS
+
+		data = move | bound << 12 | (depth + 1) << 14 | self.generation << 22 | (score + SCORE_OFFSET) << 30
+
+		if self.keys[index + 1] == key:
+			slot = index + 1
+		else:
+			current = self.data[index]
+
+			preferred = self.keys[index] == key or not current or ((current >> 14) & 0xFF) - 1 <= depth or (current >> 22) & 0xFF != self.generation
+
+			slot = index if preferred else index + 1
+
+		self.keys[slot] = key
+
+		self.data[slot] = data
+
+	# Share of slots in use by the current search, out of a sample of the table
+	def usage(self, sample = 1000):
+		slots = min(sample, self.buckets) * SLOTS
+
+		used = sum(1 for slot in range(slots) if self.data[slot] and (self.data[slot] >> 22) & 0xFF == self.generation)
+
+		return used / slots
+
+	def stats(self):
+		probes = self.hits + self.misses
+
+		return {
+			"hits": self.hits,
+			"misses": self.misses,
+			"collisions": self.collisions,
+			"hit_rate": self.hits / probes if probes else 0.0,
+			"usage": self.usage()
+		}
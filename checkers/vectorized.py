@@ -0,0 +1,385 @@
+import checkers
+
+from checkers import bitboard
+from checkers.bitboard import NEIGHBORS, DIRECTIONS, UP_LEFT, UP_RIGHT, DOWN_LEFT, DOWN_RIGHT
+from checkers.board import PACKED_CAPTURES_SHIFT
+from checkers.squares import BIT_SQUARES, SQUARE_BITS
+
+import numpy as np
+
+# Boards stacked into NumPy arrays so features and evaluations of a whole batch are one array operation each.
+# Needs numpy, which is an optional dependency (pip install checkers[numpy]).
+#
+# A batch holds an N x 32 int8 array over the dark squares (numbered like checkers.squares) with one code per square,
+# positive for red and negative for black, and the side to move of every board.
+
+EMPTY = 0
+
+RED_PIECE = 1
+
+RED_KING = 2
+
+BLACK_PIECE = -1
+
+BLACK_KING = -2
+
+_CODES = {
+	checkers.EMPTY: EMPTY,
+	checkers.PIECE | checkers.RED: RED_PIECE,
+	checkers.KING | checkers.RED: RED_KING,
+	checkers.PIECE | checkers.BLACK: BLACK_PIECE,
+	checkers.KING | checkers.BLACK: BLACK_KING
+}
+
+# Board.squares value for every code, indexed by code + 2
+_SQUARE_VALUES = np.array([checkers.KING | checkers.BLACK, checkers.PIECE | checkers.BLACK, checkers.EMPTY, checkers.PIECE | checkers.RED, checkers.KING | checkers.RED], dtype = np.int8)
+
+_BIT_SQUARES = np.array(BIT_SQUARES)
+
+_ROWS = _BIT_SQUARES // 8
+
+_COLS = _BIT_SQUARES % 8
+
+# Same region as engine.Evaluator's center bonus
+CENTER = (_ROWS >= 2) & (_ROWS <= 5) & (_COLS >= 2) & (_COLS <= 5)
+
+RED_BACK_RANK = _ROWS == 7
+
+BLACK_BACK_RANK = _ROWS == 0
+
+# Neighbor of every square in each direction, squares without one point at an extra always blocked column 32
+_NEIGHBORS = [np.array([bit if bit >= 0 else 32 for bit in NEIGHBORS[direction]]) for direction in DIRECTIONS]
+
+_BLOCKED = 127
+
+FEATURES = ("material", "kings", "back_rank", "center", "mobility", "advancement")
+
+# Weights for FEATURES in hundredths of a man, roughly those of engine.Evaluator
+DEFAULT_WEIGHTS = np.array([100, 50, 6, 3, 2, 2], dtype = np.float32)
+
+class BoardBatch:
+	def __init__(self, squares, turn):
+		self.squares = np.asarray(squares, dtype = np.int8)
+
+		self.turn = np.asarray(turn, dtype = bool)
+
+		if self.squares.ndim != 2 or self.squares.shape[1] != 32 or self.turn.shape != (self.squares.shape[0],):
+			raise ValueError("Expected N x 32 squares and N turns")
+
+	def __len__(self):
+		return self.squares.shape[0]
+
+	def from_boards(boards):
+		boards = list(boards)
+
+		squares = np.zeros((len(boards), 32), dtype = np.int8)
+
+		turn = np.zeros(len(boards), dtype = bool)
+
+		for i, board in enumerate(boards):
+			squares[i] = [_CODES[board.squares[square]] for square in BIT_SQUARES]
+
+			turn[i] = board.turn == checkers.RED
+
+		return BoardBatch(squares, turn)
+
+	def from_fens(fens):
+		return BoardBatch.from_boards(checkers.Board(fen) for fen in fens)
+
+	# N x 64 array of Board.squares values
+	def to_squares64(self):
+		squares = np.zeros((len(self), 64), dtype = np.int8)
+
+		squares[:, _BIT_SQUARES] = _SQUARE_VALUES[self.squares + 2]
+
+		return squares
+
+# Per board, how many of `pieces` have an empty neighbor in each of `directions`, summed over the directions
+def _mobility(padded, pieces, directions):
+	result = np.zeros(padded.shape[0], dtype = np.int32)
+
+	for direction in directions:
+		result += np.count_nonzero(pieces & (padded[:, _NEIGHBORS[direction]] == EMPTY), axis = 1)
+
+	return result
+
+# N x len(FEATURES) float32 array, every feature as red minus black
+def features(batch):
+	squares = batch.squares
+
+	red_pieces = squares == RED_PIECE
+
+	red_kings = squares == RED_KING
+
+	black_pieces = squares == BLACK_PIECE
+
+	black_kings = squares == BLACK_KING
+
+	red = red_pieces | red_kings
+
+	black = black_pieces | black_kings
+
+	result = np.empty((len(batch), len(FEATURES)), dtype = np.float32)
+
+	result[:, 0] = np.count_nonzero(red, axis = 1) - np.count_nonzero(black, axis = 1)
+
+	result[:, 1] = np.count_nonzero(red_kings, axis = 1) - np.count_nonzero(black_kings, axis = 1)
+
+	result[:, 2] = np.count_nonzero(red_pieces & RED_BACK_RANK, axis = 1) - np.count_nonzero(black_pieces & BLACK_BACK_RANK, axis = 1)
+
+	result[:, 3] = np.count_nonzero(red & CENTER, axis = 1) - np.count_nonzero(black & CENTER, axis = 1)
+
+	# Simple moves available, ignoring that a capture would make them illegal
+	padded = np.concatenate([squares, np.full((len(batch), 1), _BLOCKED, dtype = np.int8)], axis = 1)
+
+	red_mobility = _mobility(padded, red_pieces, (UP_LEFT, UP_RIGHT)) + _mobility(padded, red_kings, DIRECTIONS)
+
+	black_mobility = _mobility(padded, black_pieces, (DOWN_LEFT, DOWN_RIGHT)) + _mobility(padded, black_kings, DIRECTIONS)
+
+	result[:, 4] = red_mobility - black_mobility
+
+	# Rows advanced by men
+	result[:, 5] = (red_pieces * (7 - _ROWS)).sum(axis = 1) - (black_pieces * _ROWS).sum(axis = 1)
+
+	return result
+
+# Linear evaluation of every board for its side to move, in one matrix product
+def evaluate(batch, weights = DEFAULT_WEIGHTS):
+	scores = features(batch) @ np.asarray(weights, dtype = np.float32)
+
+	return np.where(batch.turn, scores, -scores)
+
+# Batched move generation. Boards are held as red, black and king masks of the dark squares (uint32 arrays, laid out
+# like checkers.bitboard) and every step below handles the whole batch at once with the same shifts BitBoard uses.
+
+_U32 = np.uint32
+
+_SQUARE_BITS = np.array([max(bit, 0) for bit in SQUARE_BITS], dtype = np.int64)
+
+_UP_LEFT_EVEN = _U32(bitboard.EVEN_ROWS & ~bitboard.TOP_ROW)
+
+_UP_LEFT_ODD = _U32(bitboard.ODD_ROWS & ~bitboard.LEFT_EDGE)
+
+_UP_RIGHT_EVEN = _U32(bitboard.EVEN_ROWS & ~bitboard.TOP_ROW & ~bitboard.RIGHT_EDGE)
+
+_UP_RIGHT_ODD = _U32(bitboard.ODD_ROWS)
+
+_DOWN_LEFT_EVEN = _U32(bitboard.EVEN_ROWS)
+
+_DOWN_LEFT_ODD = _U32(bitboard.ODD_ROWS & ~bitboard.LEFT_EDGE & ~bitboard.BOTTOM_ROW)
+
+_DOWN_RIGHT_EVEN = _U32(bitboard.EVEN_ROWS & ~bitboard.RIGHT_EDGE)
+
+_DOWN_RIGHT_ODD = _U32(bitboard.ODD_ROWS & ~bitboard.BOTTOM_ROW)
+
+_BACK_ROWS = _U32(bitboard.TOP_ROW | bitboard.BOTTOM_ROW)
+
+# Same as checkers.bitboard.step, for arrays
+def step(bits, direction):
+	if direction == UP_LEFT:
+		return ((bits & _UP_LEFT_EVEN) >> _U32(4)) | ((bits & _UP_LEFT_ODD) >> _U32(5))
+
+	if direction == UP_RIGHT:
+		return ((bits & _UP_RIGHT_EVEN) >> _U32(3)) | ((bits & _UP_RIGHT_ODD) >> _U32(4))
+
+	if direction == DOWN_LEFT:
+		return ((bits & _DOWN_LEFT_EVEN) << _U32(4)) | ((bits & _DOWN_LEFT_ODD) << _U32(3))
+
+	return ((bits & _DOWN_RIGHT_EVEN) << _U32(5)) | ((bits & _DOWN_RIGHT_ODD) << _U32(4))
+
+# Bit index of single bit masks
+def _bit_index(bits):
+	return np.log2(bits.astype(np.float64)).astype(np.int64)
+
+class MaskBatch:
+	def __init__(self, red, black, kings, turn):
+		self.red = np.asarray(red, dtype = _U32)
+
+		self.black = np.asarray(black, dtype = _U32)
+
+		self.kings = np.asarray(kings, dtype = _U32)
+
+		self.turn = np.asarray(turn, dtype = bool)
+
+	def __len__(self):
+		return self.red.shape[0]
+
+	def from_boards(boards):
+		return MaskBatch.from_batch(BoardBatch.from_boards(boards))
+
+	def from_batch(batch):
+		weights = (_U32(1) << np.arange(32, dtype = _U32))
+
+		red = ((batch.squares > 0) * weights).sum(axis = 1, dtype = _U32)
+
+		black = ((batch.squares < 0) * weights).sum(axis = 1, dtype = _U32)
+
+		kings = ((np.abs(batch.squares) == 2) * weights).sum(axis = 1, dtype = _U32)
+
+		return MaskBatch(red, black, kings, batch.turn)
+
+	def to_batch(self):
+		bit = (_U32(1) << np.arange(32, dtype = _U32))
+
+		red = (self.red[:, None] & bit) != 0
+
+		black = (self.black[:, None] & bit) != 0
+
+		king = (self.kings[:, None] & bit) != 0
+
+		squares = red.astype(np.int8) - black.astype(np.int8)
+
+		return BoardBatch(squares * np.where(king, 2, 1).astype(np.int8), self.turn)
+
+	def own(self):
+		return np.where(self.turn, self.red, self.black)
+
+	def opponent(self):
+		return np.where(self.turn, self.black, self.red)
+
+	def empty(self):
+		return ~(self.red | self.black)
+
+	# Own pieces allowed to go in direction, men only go forward
+	def movers(self, direction):
+		forward = self.turn if direction in (UP_LEFT, UP_RIGHT) else ~self.turn
+
+		return self.own() & np.where(forward, _U32(0xFFFFFFFF), self.kings)
+
+# Per direction, the pieces of every board that can make a simple move that way, shape (4, N)
+def simple_move_masks(masks):
+	empty = masks.empty()
+
+	return np.stack([masks.movers(direction) & step(empty, bitboard.OPPOSITE[direction]) for direction in DIRECTIONS])
+
+# Per direction, the pieces of every board that can capture that way, shape (4, N)
+def capture_masks(masks):
+	empty = masks.empty()
+
+	opponent = masks.opponent()
+
+	return np.stack([masks.movers(direction) & step(opponent & step(empty, bitboard.OPPOSITE[direction]), bitboard.OPPOSITE[direction]) for direction in DIRECTIONS])
+
+# Every set bit of masks as (row, single bit mask) pairs, rows being the index into masks
+def _split(masks):
+	rows = []
+
+	bits = []
+
+	for bit in range(32):
+		selected = np.nonzero((masks >> _U32(bit)) & _U32(1))[0]
+
+		rows.append(selected)
+
+		bits.append(np.full(selected.shape[0], 1 << bit, dtype = _U32))
+
+	return np.concatenate(rows), np.concatenate(bits)
+
+# Every legal move of every board as (board index, packed move) arrays sorted by board and move, packed the same way
+# as Board.generate_packed_moves. Captures are forced and carried on to the end. Multi-jumps are grown one jump per pass for all boards together,
+# so a pass costs the same whether it extends one sequence or thousands.
+def generate_moves(masks):
+	empty = masks.empty()
+
+	opponent = masks.opponent()
+
+	jumpers = np.bitwise_or.reduce(capture_masks(masks), axis = 0)
+
+	boards, origin = _split(jumpers)
+
+	position = origin.copy()
+
+	captured = np.zeros(boards.shape[0], dtype = _U32)
+
+	king = (masks.kings[boards] & origin) != 0
+
+	found_boards = []
+
+	found_moves = []
+
+	while boards.shape[0]:
+		extended = np.zeros(boards.shape[0], dtype = bool)
+
+		grown = []
+
+		for direction in DIRECTIONS:
+			forward = masks.turn[boards] if direction in (UP_LEFT, UP_RIGHT) else ~masks.turn[boards]
+
+			over = step(position, direction) & opponent[boards] & ~captured
+
+			# The moving piece has left its square, so it can land there again
+			land = step(over, direction) & (empty[boards] | origin)
+
+			ok = (king | forward) & (over != 0) & (land != 0)
+
+			extended |= ok
+
+			grown.append((boards[ok], origin[ok], land[ok], captured[ok] | over[ok], king[ok]))
+
+		done = ~extended & (captured != 0)
+
+		found_boards.append(boards[done])
+
+		found_moves.append(_pack(origin[done], position[done], captured[done]))
+
+		boards, origin, position, captured, king = (np.concatenate(column) for column in zip(*grown))
+
+	# Boards without a capture get their simple moves
+	free = jumpers == 0
+
+	for direction in DIRECTIONS:
+		boards, origin = _split(simple_move_masks(masks)[direction] & np.where(free, _U32(0xFFFFFFFF), _U32(0)))
+
+		found_boards.append(boards)
+
+		found_moves.append(_pack(origin, step(origin, direction), np.zeros(boards.shape[0], dtype = _U32)))
+
+	boards = np.concatenate(found_boards)
+
+	moves = np.concatenate(found_moves)
+
+	order = np.lexsort((moves, boards))
+
+	boards = boards[order]
+
+	moves = moves[order]
+
+	# A king going round a circle either way makes the same move twice
+	unique = np.ones(boards.shape[0], dtype = bool)
+
+	unique[1:] = (boards[1:] != boards[:-1]) | (moves[1:] != moves[:-1])
+
+	return boards[unique], moves[unique]
+
+def _pack(origin, target, captured):
+	from_square = _BIT_SQUARES[_bit_index(origin)].astype(np.uint64)
+
+	to_square = _BIT_SQUARES[_bit_index(target)].astype(np.uint64)
+
+	promotion = ((target & _BACK_ROWS) != 0).astype(np.uint64)
+
+	return from_square | to_square << np.uint64(6) | captured.astype(np.uint64) << np.uint64(PACKED_CAPTURES_SHIFT) | promotion << np.uint64(44)
+
+# Plays one packed move on every board and returns the resulting batch
+def play(masks, moves):
+	moves = np.asarray(moves, dtype = np.uint64)
+
+	origin = _U32(1) << _SQUARE_BITS[(moves & np.uint64(0x3F)).astype(np.int64)].astype(_U32)
+
+	target = _U32(1) << _SQUARE_BITS[((moves >> np.uint64(6)) & np.uint64(0x3F)).astype(np.int64)].astype(_U32)
+
+	captured = ((moves >> np.uint64(PACKED_CAPTURES_SHIFT)) & np.uint64(0xFFFFFFFF)).astype(_U32)
+
+	promotion = (moves >> np.uint64(44)) & np.uint64(1) != 0
+
+	own = (masks.own() & ~origin) | target
+
+	opponent = masks.opponent() & ~captured
+
+	was_king = (masks.kings & origin) != 0
+
+	kings = masks.kings & ~origin & ~captured
+
+	kings |= np.where(was_king | promotion, target, _U32(0))
+
+	return MaskBatch(np.where(masks.turn, own, opponent), np.where(masks.turn, opponent, own), kings, ~masks.turn)
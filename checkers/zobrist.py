@@ -0,0 +1,30 @@
+import random
+
+import checkers
+
+# Zobrist keys: a random 64-bit number per (piece, square), XORed together for every occupied square,
+# plus one more for black to move. A move only has to XOR out and in the squares it changes.
+
+# Fixed seed so the same position hashes the same in every process and every run
+_random = random.Random(0x636865636B657273)
+
+# PIECE_KEYS[piece][square], piece being a Board.squares value. Empty squares (0) hash to 0.
+PIECE_KEYS = [[0] * 64 for _ in range(6)]
+
+# 2 to 5 are black piece, red piece, black king and red king
+for _piece in range(2, 6):
+	PIECE_KEYS[_piece] = [_random.getrandbits(64) for _ in range(64)]
+
+TURN_KEY = _random.getrandbits(64)
+
+def hash_squares(squares):
+	key = 0
+
+	for square in range(64):
+		key ^= PIECE_KEYS[squares[square]][square]
+
+	return key
+
+# Hash of a board computed from scratch, what Board.zobrist_hash() should always equal
+def compute(board):
+	return hash_squares(board.squares) ^ (TURN_KEY if board.turn == checkers.BLACK else 0)
@@ -112,7 +112,7 @@ while True:
 	try:
 		last = board.parse_uci(move)
 		
-		board.play_move(board.parse_uci(move))
+		board.play_move(last)
 	except Exception as e:
 		print("Invalid move!", e)
 
@@ -135,8 +135,10 @@ while True:
 	
 		if board.winner() == checkers.RED:
 			print("Red wins!")
-		else:
+		elif board.winner() == checkers.BLACK:
 			print("Black wins!")
+		else:
+			print("Draw!")
 		
 		break
 
@@ -7,4 +7,5 @@ setuptools.setup(
     url='https://github.com/RecursiveDescent/python-checkers',
     packages=['checkers'],
     install_requires=['svgwrite'],
+    extras_require={'numpy': ['numpy']},
 )
\ No newline at end of file